@@ -0,0 +1,34 @@
+"""Convolution of a long signal with 16, 256 and 1024 tap kernels, in 1024 and 64 sample chunks.
+
+Run with ``PYTHONPATH=src python benchmarks/bench_convolve.py``."""
+import math
+import timeit
+
+import more_streamtools
+import numeric_streamtools
+from sicp_streams import Stream
+
+N = 20000
+
+
+def _signal(chunk_size):
+    return Stream.from_iterable((math.sin(i / 10) for i in range(N)), chunk_size=chunk_size)
+
+
+def main():
+    for chunk_size, taps in ((1024, 16), (1024, 256), (1024, 1024), (64, 16), (64, 256), (64, 1024)):
+        kernel = [1 / taps] * taps
+        cases = [('more_streamtools', lambda: list(more_streamtools.convolve(_signal(chunk_size), kernel)))]
+        if hasattr(numeric_streamtools, 'convolve'):
+            cases.append(('numeric direct',
+                          lambda: list(numeric_streamtools.convolve(_signal(chunk_size), kernel, method='direct'))))
+            if numeric_streamtools.numpy is not None:
+                cases.append(('numeric fft',
+                              lambda: list(numeric_streamtools.convolve(_signal(chunk_size), kernel, method='fft'))))
+        for name, func in cases:
+            seconds = min(timeit.repeat(func, number=1, repeat=3))
+            print(f'{taps:4} taps {chunk_size:4} chunk {name:>16}: {seconds * 1e9 / N:9.1f} ns/sample')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Streams of the lines of a file: ``from_iterable(open(...))`` against `Stream.from_mmap` and `Stream.from_file`.
+
+Run with ``PYTHONPATH=src python benchmarks/bench_files.py``."""
+import collections
+import os
+import tempfile
+import timeit
+from functools import partial
+
+from sicp_streams import Stream
+
+N = 1000000
+RECORD = 4096
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'log')
+        Stream.to_file(Stream.from_iterable(b'%d some log line\n' % i for i in range(N)), path)
+        cases = [
+            ('open', lambda: Stream.from_iterable(open(path, 'rb'))),
+            ('open chunked', lambda: Stream.from_iterable(open(path, 'rb'), chunk_size=1024)),
+            ('from_mmap', lambda: Stream.from_mmap(path)),
+            ('from_file', lambda: Stream.from_file(path)),
+        ]
+        for name, factory in cases:
+            seconds = min(timeit.repeat(lambda: collections.deque(factory(), maxlen=0), number=1, repeat=3))
+            s = factory()
+            collections.deque(s, maxlen=0)
+            again = min(timeit.repeat(lambda: collections.deque(s, maxlen=0), number=1, repeat=3))
+            print(f'{name:>13}: {seconds * 1e9 / N:8.1f} ns/line, walking it again {again * 1e9 / N:6.1f} ns/line')
+        seconds = min(timeit.repeat(lambda: Stream.to_file(Stream.from_mmap(path), os.devnull), number=1, repeat=3))
+        print(f'{"to_file":>13}: {seconds * 1e9 / N:8.1f} ns/line')
+
+        # zero-copy pays off with records larger than a few hundred bytes
+        records = os.path.getsize(path) // RECORD
+        with open(path, 'r+b') as f:
+            f.truncate(records * RECORD)
+        cases = [
+            ('read', lambda: Stream.from_iterable(iter(partial(open(path, 'rb').read, RECORD), b''), chunk_size=1024)),
+            ('from_mmap', lambda: Stream.from_mmap(path, size=RECORD)),
+            ('from_file', lambda: Stream.from_file(path, size=RECORD)),
+        ]
+        for name, factory in cases:
+            seconds = min(timeit.repeat(lambda: collections.deque(factory(), maxlen=0), number=1, repeat=3))
+            print(f'{name:>13}: {seconds * 1e9 / records:8.1f} ns/{RECORD}-byte record')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""Five-stage transform, nested combinators against a fused `streamtools.Pipeline`.
+
+Run with ``PYTHONPATH=src python benchmarks/bench_fusion.py``."""
+import timeit
+
+import streamtools
+from sicp_streams import Stream
+
+N = 100000
+
+
+def nested():
+    s = Stream.from_iterable(range(N))
+    s = streamtools.smap(lambda x: x + 1, s)
+    s = streamtools.sfilter(lambda x: x % 3, s)
+    s = streamtools.smap(lambda x: (x, 2), s)
+    s = streamtools.starmap(pow, s)
+    s = streamtools.takewhile(lambda x: x >= 0, s)
+    for _ in s:
+        pass
+
+
+def fused():
+    s = (streamtools.Pipeline(Stream.from_iterable(range(N)))
+         .smap(lambda x: x + 1)
+         .sfilter(lambda x: x % 3)
+         .smap(lambda x: (x, 2))
+         .starmap(pow)
+         .takewhile(lambda x: x >= 0)
+         .stream())
+    for _ in s:
+        pass
+
+
+def main():
+    for name, func in [('nested', nested), ('fused', fused)]:
+        seconds = min(timeit.repeat(func, number=1, repeat=3))
+        print(f'{name:>8}: {seconds * 1e9 / N:8.1f} ns/element')
+
+
+if __name__ == '__main__':
+    main()
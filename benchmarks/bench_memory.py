@@ -0,0 +1,71 @@
+"""Bytes kept alive per forced Stream node.
+
+Run with ``PYTHONPATH=src python benchmarks/bench_memory.py``."""
+import gc
+import itertools
+import tracemalloc
+
+import streamtools
+from sicp_streams import SpillFile, Stream
+
+N = 100000
+
+
+def _forced_count(n):
+    s = streamtools.count()
+    s[n - 1]
+    return s
+
+
+def _forced_from_iterable(n):
+    s = Stream.from_iterable(itertools.repeat(None, n))
+    s[n - 1]
+    return s
+
+
+def _forced_smap(n):
+    s = streamtools.smap(lambda x: x, Stream.from_iterable(itertools.repeat(None, n)))
+    s[n - 1]
+    return s
+
+
+def _forced_chunked(n):
+    s = Stream.from_iterable(range(n), chunk_size=1000)
+    s[n - 1]
+    return s
+
+
+def _forced_spilled(n):
+    s = Stream.from_iterable(range(n), chunk_size=1000, spill=SpillFile(window=4))
+    s[n - 1]
+    return s
+
+
+def bytes_per_node(factory, n=N):
+    """memory retained by a stream with ``n`` forced nodes, divided by ``n``"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        base, _ = tracemalloc.get_traced_memory()
+        s = factory(n)
+        gc.collect()
+        used, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del s
+    return (used - base) / n
+
+
+def main():
+    for name, factory in [
+        ('count', _forced_count),  # heads are ints, 28 bytes each above 256
+        ('from_iterable', _forced_from_iterable),
+        ('smap', _forced_smap),  # keeps both the mapped and the source stream
+        ('chunked', _forced_chunked),  # ints as well
+        ('spilled', _forced_spilled),  # the same, all but four chunks in a temporary file
+    ]:
+        print(f'{name:>16}: {bytes_per_node(factory):8.1f} bytes/node')
+
+
+if __name__ == '__main__':
+    main()
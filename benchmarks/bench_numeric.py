@@ -0,0 +1,43 @@
+"""`streamdemo.pi_stream` and its Euler transform, element by element against array blocks.
+
+Run with ``PYTHONPATH=src python benchmarks/bench_numeric.py``, with and without NumPy installed."""
+import timeit
+
+import numeric_streamtools
+import streamdemo
+import streamtools
+
+N = 100000
+
+
+def plain():
+    pi_stream = streamtools.smap(lambda x: x * 4, streamtools.accumulate(streamdemo.pi_summands(1)))
+    return pi_stream[N - 1], streamdemo.euler_transform(pi_stream)[N // 100]
+
+
+def numeric():
+    pi_stream = numeric_streamtools.smap(lambda x: x * 4,
+                                         numeric_streamtools.accumulate(
+                                             numeric_streamtools.from_iterable(_pi_summands())),
+                                         vectorized=True)
+    return pi_stream[N - 1], streamdemo.euler_transform(pi_stream)[N // 100]
+
+
+def _pi_summands():
+    sign, x = 1, 1
+    while True:
+        yield sign / x
+        sign = -sign
+        x += 2
+
+
+def main():
+    print('numpy' if numeric_streamtools.numpy is not None else 'array.array')
+    assert abs(plain()[0] - numeric()[0]) < 1e-12
+    for name, func in [('plain', plain), ('numeric', numeric)]:
+        seconds = min(timeit.repeat(func, number=1, repeat=3))
+        print(f'{name:>8}: {seconds * 1e9 / N:8.1f} ns/element')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,24 @@
+"""Pickling a forced stream of a million ints, against pickling the same ints in a list.
+
+Run with ``PYTHONPATH=src python benchmarks/bench_pickle.py``."""
+import pickle
+import timeit
+
+from sicp_streams import Stream
+
+N = 1000000
+
+
+def main():
+    stream = Stream.from_iterable(range(N))
+    list(stream)
+    for name, obj in [('list', list(range(N))), ('stream', stream)]:
+        data = pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+        dump = min(timeit.repeat(lambda: pickle.dumps(obj, pickle.HIGHEST_PROTOCOL), number=1, repeat=3))
+        load = min(timeit.repeat(lambda: pickle.loads(data), number=1, repeat=3))
+        print(f'{name:>8}: dumps {dump * 1e9 / N:6.1f} ns/element, loads {load * 1e9 / N:6.1f} ns/element, '
+              f'{len(data) / N:4.1f} bytes/element')
+
+
+if __name__ == '__main__':
+    main()
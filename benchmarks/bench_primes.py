@@ -0,0 +1,33 @@
+"""Time to the n-th prime: SICP's nested-sfilter sieve, trial division, and the segmented sieve.
+
+Trial division and the segmented sieve take their divisors from the module-level
+`streamdemo.primes` and `streamdemo.segmented_primes`, which stay forced between runs.
+
+Run with ``PYTHONPATH=src python benchmarks/bench_primes.py``."""
+import time
+
+import streamdemo
+import streamtools
+from sicp_streams import Stream
+
+
+def _fresh_streams():
+    return {
+        'sieve (sfilter)': streamdemo._sieve(streamtools.count(2)),
+        'trial division': Stream(2, lambda: streamtools.sfilter(streamdemo._prime2p, streamtools.count(3))),
+        'segmented': streamdemo._from_chunks(streamdemo._prime_segments(1 << 16)),
+    }
+
+
+def main():
+    for n in (500, 2000, 10 ** 6):
+        for name, primes in _fresh_streams().items():
+            if n > 2000 and name != 'segmented':
+                continue  # minutes to hours
+            start = time.perf_counter()
+            p = primes[n - 1]
+            print(f'{name:>16}: prime #{n} = {p} in {time.perf_counter() - start:8.3f} s')
+
+
+if __name__ == '__main__':
+    main()
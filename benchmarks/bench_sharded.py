@@ -0,0 +1,44 @@
+"""CPU-bound pipeline on one interpreter against `concurrent_streamtools.parallel_pipeline` on 1, 2, 4 ... processes.
+
+Run with ``PYTHONPATH=src python benchmarks/bench_sharded.py``; the speedup should grow with the
+number of processes up to the number of cores."""
+import concurrent.futures
+import os
+import time
+
+import concurrent_streamtools
+import streamtools
+from sicp_streams import Stream
+
+N = 20000
+
+
+def _work(x):
+    return sum(i * i for i in range(x % 100 + 500))
+
+
+def _pipeline():
+    return streamtools.Pipeline(Stream.from_iterable(range(N))).smap(_work).sfilter(bool).accumulate()
+
+
+def _seconds(func):
+    start = time.perf_counter()
+    for _ in func():
+        pass
+    return time.perf_counter() - start
+
+
+def main():
+    serial = _seconds(lambda: _pipeline().stream())
+    print(f'{"serial":>12}: {serial:6.2f} s')
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            seconds = _seconds(lambda: concurrent_streamtools.parallel_pipeline(
+                _pipeline(), executor, chunk_size=256, prefetch=2 * workers))
+        print(f'{workers:>2} processes: {seconds:6.2f} s, {serial / seconds:4.1f}x')
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main()
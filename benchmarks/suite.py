@@ -0,0 +1,431 @@
+"""Throughput and memory of the stream core, streamtools, more_streamtools and streamdemo.
+
+Every case is timed against the equivalent itertools / builtin code when there is one,
+and reports elements per second and the peak traced bytes per element.
+
+Run with ``PYTHONPATH=src python benchmarks/suite.py``, it runs again with ``PYTHONHASHSEED=0``
+unless a seed is set. Options:
+
+``--json FILE``         also write the results as JSON
+``--baseline FILE``     compare with a stored result (none if empty), exit with 1 if a case got slower
+                        than the tolerance, after scaling the baseline by how much faster or slower
+                        the itertools code ran
+``--tolerance RATIO``   allowed slowdown against the baseline, 0.25 by default
+``--update-baseline``   write the results to the baseline file instead of comparing
+``--scale FACTOR``      multiply the number of elements of every case
+``-k TEXT``             only run the cases whose name contains TEXT
+``--case NAME``         only run the case NAME, can be repeated
+``--retries N``         time the cases that got slower again in a new process, up to N times
+                        (3 by default), and keep their best run: a whole process can be slower than the next
+"""
+import argparse
+import collections
+import gc
+import heapq
+import itertools
+import json
+import operator
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from functools import partial
+
+import more_streamtools
+import streamdemo
+import streamtools
+from sicp_streams import Stream, StreamIndex
+
+N = 20000
+REPEAT = 25
+MIN_SECONDS = 0.01  # many short repeats: the best of them is the least disturbed by the rest of the machine
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+Case = collections.namedtuple('Case', 'name n run baseline')
+
+
+def _consume(iterable):
+    collections.deque(iterable, maxlen=0)
+
+
+def _count(iterable):
+    return sum(1 for _ in iterable)
+
+
+def _forced(n, chunk_size=1):
+    s = Stream.from_iterable(range(n), chunk_size=chunk_size)
+    _consume(s)
+    return s
+
+
+def _inc(x):
+    return x + 1
+
+
+def _odd(x):
+    return x % 2
+
+
+def _tens(x):
+    return x // 10
+
+
+# itertools recipes, the baselines of the more_streamtools functions named after them
+
+def _all_equal(iterable):
+    g = itertools.groupby(iterable)
+    return next(g, True) and not next(g, False)
+
+
+def _partition(predicate, iterable):
+    t1, t2 = itertools.tee(iterable)
+    return itertools.filterfalse(predicate, t1), filter(predicate, t2)
+
+
+def _iter_except(func, exception):
+    try:
+        while True:
+            yield func()
+    except exception:
+        pass
+
+
+def _cases(n):
+    s = _forced(n)
+    s2 = _forced(n)
+    chunked = _forced(n, 1000)
+    chunked2 = _forced(n, 1000)
+    small = _forced(n // 1000 + 2)
+    same = Stream.from_iterable(itertools.repeat(0, n))
+    _consume(same)
+    pairs = Stream.from_iterable(x // 2 for x in range(n))
+    _consume(pairs)
+    data = range(n)
+
+    def build(n):
+        p = None
+        for i in range(n - 1, -1, -1):
+            p = Stream(i, p)
+        return p
+
+    def fibs():
+        fibs = Stream(0, 1, lambda: streamtools.smap(operator.add, fibs.tail, fibs))
+        return fibs
+
+    def integers():
+        integers = Stream(1, lambda: streamtools.smap(operator.add, streamdemo.ones, integers))
+        return integers
+
+    def factorials():
+        factorials = Stream(1, lambda: streamtools.smap(operator.mul, factorials, streamtools.count(2)))
+        return factorials
+
+    def primes2():
+        # trial division by `streamdemo.primes`, forced once and then shared by every run
+        return Stream(2, lambda: streamtools.sfilter(streamdemo._prime2p, streamtools.count(3)))
+
+    def pi_stream():
+        return streamtools.smap(lambda x: x * 4, streamtools.accumulate(Stream.from_iterable(pi_summands())))
+
+    def _hamming():
+        hamming = Stream(1, lambda: more_streamtools.union(
+            *(streamtools.smap(partial(operator.mul, m), hamming) for m in (2, 3, 5))))
+        return hamming
+
+    def pi_summands():
+        sign, x = 1, 1
+        while True:
+            yield sign / x
+            sign, x = -sign, x + 2
+
+    return [
+        # core
+        Case('construct', n, lambda: build(n), lambda: tuple(data)),
+        Case('from_iterable', n, lambda: _consume(Stream.from_iterable(data)), lambda: _consume(iter(data))),
+        Case('from_iterable chunked', n, lambda: _consume(Stream.from_iterable(data, chunk_size=1000)),
+             lambda: _consume(iter(data))),
+        Case('iter', n, lambda: _consume(s), lambda: _consume(data)),
+        Case('iter chunked', n, lambda: _consume(chunked), lambda: _consume(data)),
+        Case('tail walk', n, lambda: more_streamtools.tail(1, s), lambda: _consume(data)),
+        Case('getitem', n, lambda: s[n - 1], lambda: next(itertools.islice(data, n - 1, None))),
+        Case('getitem chunked', n, lambda: chunked[n - 1], lambda: next(itertools.islice(data, n - 1, None))),
+        Case('StreamIndex', n, lambda: StreamIndex(s)[n - 1], lambda: list(data)[n - 1]),
+        Case('eq', n, lambda: s == s2, lambda: all(map(operator.eq, data, data))),
+        Case('eq chunked', n, lambda: chunked == chunked2, lambda: all(map(operator.eq, data, data))),
+        # streamtools
+        Case('smap', n, lambda: _consume(streamtools.smap(_inc, s)), lambda: _consume(map(_inc, data))),
+        Case('smap chunked', n, lambda: _consume(streamtools.smap(_inc, chunked)),
+             lambda: _consume(map(_inc, data))),
+        Case('smap 2 streams', n, lambda: _consume(streamtools.smap(operator.add, s, s2)),
+             lambda: _consume(map(operator.add, data, data))),
+        Case('szip', n, lambda: _consume(streamtools.szip(s, s2)), lambda: _consume(zip(data, data))),
+        Case('sfilter', n, lambda: _consume(streamtools.sfilter(_odd, s)), lambda: _consume(filter(_odd, data))),
+        Case('sfilter chunked', n, lambda: _consume(streamtools.sfilter(_odd, chunked)),
+             lambda: _consume(filter(_odd, data))),
+        Case('count', n, lambda: streamtools.count()[n - 1], lambda: next(itertools.islice(itertools.count(), n - 1, None))),
+        Case('cycle', n, lambda: streamtools.cycle(small)[n - 1],
+             lambda: next(itertools.islice(itertools.cycle(range(n // 1000 + 2)), n - 1, None))),
+        Case('repeat', n, lambda: _consume(streamtools.repeat(None, n)), lambda: _consume(itertools.repeat(None, n))),
+        Case('accumulate', n, lambda: _consume(streamtools.accumulate(s)), lambda: _consume(itertools.accumulate(data))),
+        Case('chain', n, lambda: _consume(streamtools.chain(s, s2)), lambda: _consume(itertools.chain(data, data))),
+        Case('chain_from_streams', n, lambda: _consume(streamtools.chain_from_streams(Stream(s, s2, None))),
+             lambda: _consume(itertools.chain.from_iterable((data, data)))),
+        Case('compress', n, lambda: _consume(streamtools.compress(s, streamtools.cycle(Stream(0, 1)))),
+             lambda: _consume(itertools.compress(data, itertools.cycle((0, 1))))),
+        Case('dropwhile', n, lambda: streamtools.dropwhile(lambda x: x < n - 1, s),
+             lambda: _consume(itertools.dropwhile(lambda x: x < n - 1, data))),
+        Case('filterfalse', n, lambda: _consume(streamtools.filterfalse(_odd, s)),
+             lambda: _consume(itertools.filterfalse(_odd, data))),
+        Case('groupby', n, lambda: _consume(streamtools.groupby(s, lambda x: x // 10)),
+             lambda: _consume(itertools.groupby(data, lambda x: x // 10))),
+        Case('sslice', n, lambda: _consume(streamtools.sslice(s, 0, None, 2)),
+             lambda: _consume(itertools.islice(data, 0, None, 2))),
+        Case('sslice chunked', n, lambda: _consume(streamtools.sslice(chunked, 0, None, 2)),
+             lambda: _consume(itertools.islice(data, 0, None, 2))),
+        Case('starmap', n, lambda: _consume(streamtools.starmap(operator.add, streamtools.szip(s, s2))),
+             lambda: _consume(itertools.starmap(operator.add, zip(data, data)))),
+        Case('takewhile', n, lambda: _consume(streamtools.takewhile(lambda x: True, s)),
+             lambda: _consume(itertools.takewhile(lambda x: True, data))),
+        Case('zip_longest', n, lambda: _consume(streamtools.zip_longest(s, small)),
+             lambda: _consume(itertools.zip_longest(data, range(n // 1000 + 2)))),
+        Case('product', n // 100 * 100, lambda: _consume(streamtools.product(_forced(n // 100), _forced(100))),
+             lambda: _consume(itertools.product(range(n // 100), range(100)))),
+        Case('permutations', _count(itertools.permutations(range(7), 4)), lambda: _consume(streamtools.permutations(_forced(7), 4)),
+             lambda: _consume(itertools.permutations(range(7), 4))),
+        Case('combinations', _count(itertools.combinations(range(12), 4)), lambda: _consume(streamtools.combinations(_forced(12), 4)),
+             lambda: _consume(itertools.combinations(range(12), 4))),
+        Case('combinations_with_replacement', _count(itertools.combinations_with_replacement(range(8), 4)),
+             lambda: _consume(streamtools.combinations_with_replacement(_forced(8), 4)),
+             lambda: _consume(itertools.combinations_with_replacement(range(8), 4))),
+        Case('tee', n, lambda: [_consume(t) for t in streamtools.tee(s)],
+             lambda: [_consume(t) for t in itertools.tee(data)]),
+        Case('Pipeline', n, lambda: _consume(streamtools.Pipeline(s).smap(_inc).sfilter(_odd).stream()),
+             lambda: _consume(filter(_odd, map(_inc, data)))),
+        # more_streamtools
+        Case('take', n, lambda: more_streamtools.take(n, s), lambda: list(itertools.islice(data, n))),
+        Case('prepend', n, lambda: _consume(more_streamtools.prepend(-1, s)),
+             lambda: _consume(itertools.chain((-1,), data))),
+        Case('append', n, lambda: _consume(more_streamtools.append(s, -1)),
+             lambda: _consume(itertools.chain(data, (-1,)))),
+        Case('reverse', n, lambda: _consume(more_streamtools.reverse(s)), lambda: _consume(reversed(list(data)))),
+        Case('tabulate', n, lambda: more_streamtools.tabulate(_inc)[n - 1],
+             lambda: next(itertools.islice(map(_inc, itertools.count()), n - 1, None))),
+        Case('all_equal', n, lambda: more_streamtools.all_equal(same), lambda: _all_equal(itertools.repeat(0, n))),
+        Case('pad_none', n, lambda: more_streamtools.pad_none(small)[n - 1],
+             lambda: next(itertools.islice(itertools.chain(range(n // 1000 + 2), itertools.repeat(None)),
+                                           n - 1, None))),
+        Case('ncycles', (n // 1000 + 2) * 1000, lambda: _consume(more_streamtools.ncycles(small, 1000)),
+             lambda: _consume(itertools.chain.from_iterable(itertools.repeat(range(n // 1000 + 2), 1000)))),
+        Case('flatten', 2 * n, lambda: _consume(more_streamtools.flatten(Stream(s, s2, None))),
+             lambda: _consume(itertools.chain.from_iterable((data, data)))),
+        Case('repeatfunc', n, lambda: _consume(more_streamtools.repeatfunc(operator.add, n, 1, 2)),
+             lambda: _consume(itertools.starmap(operator.add, itertools.repeat((1, 2), n)))),
+        Case('pairwise', n, lambda: _consume(more_streamtools.pairwise(s)),
+             lambda: _consume(zip(data, itertools.islice(data, 1, None)))),
+        Case('grouper', n, lambda: _consume(more_streamtools.grouper(s, 4)),
+             lambda: _consume(itertools.zip_longest(*[iter(data)] * 4))),
+        Case('partition', n, lambda: [_consume(p) for p in more_streamtools.partition(_odd, s)],
+             lambda: [_consume(p) for p in _partition(_odd, data)]),
+        Case('powerset', 1 << 12, lambda: _consume(more_streamtools.powerset(_forced(12))),
+             lambda: _consume(itertools.chain.from_iterable(itertools.combinations(range(12), r) for r in range(13)))),
+        Case('unique_justseen', n, lambda: _consume(more_streamtools.unique_justseen(s, _tens)),
+             lambda: _consume(map(next, map(operator.itemgetter(1), itertools.groupby(data, _tens))))),
+        Case('iter_except', n, lambda: _consume(more_streamtools.iter_except(list(data).pop, IndexError)),
+             lambda: _consume(_iter_except(list(data).pop, IndexError))),
+        Case('first_true', n, lambda: more_streamtools.first_true(s, None, lambda x: x >= n - 1),
+             lambda: next(filter(lambda x: x >= n - 1, data), None)),
+        Case('fir_filter', n, lambda: _consume(more_streamtools.fir_filter(s, (0.25, 0.5, 0.25))), None),
+        Case('quantify', n, lambda: more_streamtools.quantify(s, _odd), lambda: sum(map(_odd, data))),
+        Case('dotproduct', n, lambda: more_streamtools.dotproduct(s, s2), lambda: sum(map(operator.mul, data, data))),
+        Case('convolve', n, lambda: _consume(more_streamtools.convolve(s, (0.25, 0.5, 0.25))), None),
+        Case('sliding_window', n, lambda: _consume(more_streamtools.sliding_window(s, 4)), None),
+        Case('batched', n, lambda: _consume(more_streamtools.batched(s, 4)), None),
+        Case('unique_everseen', n, lambda: _consume(more_streamtools.unique_everseen(s, _odd)), None),
+        Case('roundrobin', n, lambda: _consume(more_streamtools.roundrobin(s, s2)), None),
+        Case('merge', n, lambda: _consume(more_streamtools.merge(*(_forced(n // 8) for _ in range(8)))),
+             lambda: _consume(heapq.merge(*(range(n // 8) for _ in range(8))))),
+        Case('union', n, lambda: _consume(more_streamtools.union(s, s2)), None),
+        Case('intersection', n, lambda: _consume(more_streamtools.intersection(s, s2)), None),
+        Case('difference', n, lambda: _consume(more_streamtools.difference(s, small)), None),
+        Case('dedupe_sorted', n, lambda: _consume(more_streamtools.dedupe_sorted(pairs)),
+             lambda: _consume(map(operator.itemgetter(0), itertools.groupby(x // 2 for x in data)))),
+        # streamdemo
+        Case('streamdemo fibs', n // 10, lambda: fibs()[n // 10 - 1], None),
+        Case('streamdemo integers', n // 10, lambda: integers()[n // 10 - 1], None),
+        Case('streamdemo factorials', n // 100, lambda: factorials()[n // 100 - 1], None),
+        Case('streamdemo pi_stream', n, lambda: pi_stream()[n - 1], None),
+        Case('streamdemo euler_transform', n // 10,
+             lambda: streamdemo.euler_transform(Stream.from_iterable(pi_summands()))[n // 10 - 1], None),
+        Case('streamdemo hamming', n // 10, lambda: _hamming()[n // 10 - 1], None),
+        Case('streamdemo accelerated_pi_stream', 10,
+             lambda: streamdemo.accelerated_sequence(streamdemo.euler_transform, pi_stream())[9], None),
+        Case('streamdemo primes', 200, lambda: streamdemo._sieve(streamtools.count(2))[199], None),
+        Case('streamdemo primes2', 1000, lambda: primes2()[999], None),
+        Case('streamdemo segmented_primes', 10 * n,
+             lambda: streamdemo._from_chunks(streamdemo._prime_segments(1 << 16))[10 * n - 1], None),
+    ]
+
+
+def _time(func, number):
+    """seconds per call of ``func`` over ``number`` calls, without the garbage collector, like `timeit`"""
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        return (time.perf_counter() - start) / number
+    finally:
+        gc.enable()
+
+
+def _seconds(funcs):
+    """best time of one call of each of ``funcs``, each repeat calling it for at least `MIN_SECONDS`
+
+    The repeats go round all the functions, so a slow spell of the machine costs a few repeats
+    of every function instead of all the repeats of a few."""
+    numbers = []
+    for func in funcs:
+        number = 1
+        while _time(func, number) * number < MIN_SECONDS:
+            number *= 2
+        numbers.append(number)
+    best = [float('inf')] * len(funcs)
+    for _ in range(REPEAT):
+        for i, (func, number) in enumerate(zip(funcs, numbers)):
+            best[i] = min(best[i], _time(func, number))
+    return best
+
+
+def _peak_bytes(func):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run(scale=1.0, keyword='', names=None):
+    cases = [case for case in _cases(max(int(N * scale), 1000))
+             if keyword in case.name and (not names or case.name in names)]
+    baselines = [case for case in cases if case.baseline is not None]
+    seconds = _seconds([case.run for case in cases] + [case.baseline for case in baselines])
+    baseline_seconds = dict(zip((case.name for case in baselines), seconds[len(cases):]))
+    results = {}
+    for case, case_seconds in zip(cases, seconds):
+        result = {
+            'n': case.n,
+            'seconds': case_seconds,
+            'elements_per_second': case.n / case_seconds,
+            'bytes_per_element': _peak_bytes(case.run) / case.n,
+        }
+        if case.baseline is not None:
+            result['itertools_elements_per_second'] = case.n / baseline_seconds[case.name]
+        results[case.name] = result
+        print(f"{case.name:>30}: {result['elements_per_second']:12.0f} el/s"
+              f" {result['bytes_per_element']:9.1f} B/el"
+              + (f"  ({result['elements_per_second'] / result['itertools_elements_per_second']:6.1%}"
+                 f" of itertools)" if case.baseline is not None else ''),
+              file=sys.stderr)
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cases': results,
+    }
+
+
+def _machine_speed(results, baseline):
+    """how many times faster the itertools code of ``results`` ran than that of ``baseline``: the median
+    over the cases, each of which is too short to compare on its own"""
+    ratios = sorted(result['itertools_elements_per_second'] / before['itertools_elements_per_second']
+                    for name, result in results['cases'].items()
+                    for before in [baseline['cases'].get(name)]
+                    if before is not None and 'itertools_elements_per_second' in result
+                    and 'itertools_elements_per_second' in before)
+    return ratios[len(ratios) // 2] if ratios else 1.0
+
+
+def regressions(results, baseline, tolerance, speed=None):
+    """names of the cases that are slower than ``baseline`` by more than ``tolerance``,
+    on a machine ``speed`` times as fast as that of ``baseline`` (measured if not given)"""
+    if speed is None:
+        speed = _machine_speed(results, baseline)
+    slower = []
+    for name, result in results['cases'].items():
+        before = baseline['cases'].get(name)
+        if before is None:
+            continue
+        if result['elements_per_second'] < before['elements_per_second'] * speed * (1 - tolerance):
+            slower.append(name)
+    return slower
+
+
+def _rerun(names, scale):
+    """results of the cases ``names`` timed in a new process"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'results.json')
+        subprocess.check_call([sys.executable, os.path.abspath(__file__), '--json', path, '--baseline', '',
+                               '--scale', str(scale)] + [arg for name in names for arg in ('--case', name)])
+        with open(path) as f:
+            return json.load(f)
+
+
+def main(argv=None):
+    if 'PYTHONHASHSEED' not in os.environ:
+        # string hashes decide where attribute names land in the type caches, a random seed makes a
+        # process up to a third slower than the next one: every run uses the same seed, like pyperf
+        argv = sys.argv[1:] if argv is None else argv
+        return subprocess.call([sys.executable, os.path.abspath(__file__)] + argv,
+                               env=dict(os.environ, PYTHONHASHSEED='0'))
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--json')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--scale', type=float, default=1.0)
+    parser.add_argument('-k', dest='keyword', default='')
+    parser.add_argument('--case', dest='names', action='append')
+    parser.add_argument('--retries', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    results = run(args.scale, args.keyword, args.names)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        return 0
+    if not args.baseline or not os.path.exists(args.baseline):
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    # measured once on all the cases, the few that are timed again would not give a steady median
+    speed = _machine_speed(results, baseline)
+    slower = regressions(results, baseline, args.tolerance, speed)
+    for _ in range(args.retries):
+        if not slower:
+            break
+        print(f"timing {', '.join(slower)} again", file=sys.stderr)
+        for name, result in _rerun(slower, args.scale)['cases'].items():
+            if result['elements_per_second'] > results['cases'][name]['elements_per_second']:
+                results['cases'][name] = result
+        slower = regressions(results, baseline, args.tolerance, speed)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(results, f, indent=2)
+    for name in slower:
+        print(f"REGRESSION {name}: {results['cases'][name]['elements_per_second']:.0f} el/s, "
+              f"baseline {baseline['cases'][name]['elements_per_second'] * speed:.0f} el/s "
+              f"on this machine ({speed:.2f} times the stored one)", file=sys.stderr)
+    return 1 if slower else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""streamtools for AsyncStream
+
+Every function is a coroutine function returning an `AsyncStream` or None.
+Functions passed in may return awaitables, which are awaited."""
+import asyncio
+import inspect
+from functools import partial
+
+from sicp_streams import AsyncStream
+
+
+async def _maybe_await(value):
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+
+async def smap(func, *streams):
+    async def resolve():
+        tails = await asyncio.gather(*(s.tail for s in streams))
+        if not all(tails):
+            return None
+        return await smap(func, *tails)
+
+    return AsyncStream(await _maybe_await(func(*(s.head for s in streams))), resolve)
+
+
+async def szip(*streams):
+    async def resolve():
+        tails = await asyncio.gather(*(s.tail for s in streams))
+        if not all(tails):
+            return None
+        return await szip(*tails)
+
+    return AsyncStream(tuple(s.head for s in streams), resolve)
+
+
+async def sfilter(func, stream):
+    while stream is not None and not await _maybe_await(func(stream.head)):
+        stream = await stream.tail
+    if stream is None:
+        return None
+    return AsyncStream(stream.head, partial(_sfilter_tail, func, stream))
+
+
+async def _sfilter_tail(func, stream):
+    return await sfilter(func, await stream.tail)
+
+
+async def chain(*streams):
+    if not streams:
+        return None
+    first, *streams = streams
+    if first is None:
+        return await chain(*streams)
+    if not streams:
+        return first
+    return AsyncStream(first.head, partial(_chain_tail, first, streams))
+
+
+async def _chain_tail(first, streams):
+    return await chain(await first.tail, *streams)
+
+
+async def sslice(stream, *args):
+    s = slice(*args)
+    start, stop, step = s.start or 0, s.stop or float('+inf'), s.step or 1
+
+    if stop <= start:
+        return None
+    while stream is not None and start > 0:
+        stream = await stream.tail
+        start -= 1
+        stop -= 1
+    if stream is None:
+        return None
+    return AsyncStream(stream.head, partial(sslice, stream, step, stop, step))
@@ -0,0 +1,225 @@
+"""streamtools running work ahead of consumption on `concurrent.futures` executors
+
+The results are ordinary memoized `Stream`s."""
+import collections
+import concurrent.futures
+import itertools
+import os
+import threading
+import weakref
+from functools import partial
+
+import streamtools
+from sicp_streams import Stream
+
+_default_executor = None
+_default_process_executor = None
+_default_executor_lock = threading.Lock()
+
+
+def _get_default_executor():
+    global _default_executor
+    with _default_executor_lock:
+        if _default_executor is None:
+            _default_executor = concurrent.futures.ThreadPoolExecutor()
+        return _default_executor
+
+
+def _get_default_process_executor():
+    global _default_process_executor
+    with _default_executor_lock:
+        if _default_process_executor is None:
+            _default_process_executor = concurrent.futures.ProcessPoolExecutor()
+        return _default_process_executor
+
+
+class _ReadAhead:
+    """Submits ``func`` on the next elements of ``source``, keeping up to ``prefetch`` of them in flight.
+
+    Only the thunk of the last forced node calls `next`, so it is never entered concurrently."""
+
+    def __init__(self, func, stream, executor, prefetch, ordered):
+        self.func = func
+        self.source = stream
+        self.executor = _get_default_executor() if executor is None else executor
+        self.prefetch = (os.cpu_count() or 1) if prefetch is None else prefetch
+        self.ordered = ordered
+        self.futures = collections.deque()
+
+    def next(self):
+        # one more than prefetch, as the one to be returned now is no longer ahead
+        while self.source is not None and len(self.futures) <= self.prefetch:
+            self.futures.append(self.executor.submit(self.func, self.source.head))
+            self.source = self.source.tail
+        if not self.futures:
+            return None
+        if self.ordered:
+            future = self.futures[0]
+        else:
+            done, _ = concurrent.futures.wait(self.futures, return_when=concurrent.futures.FIRST_COMPLETED)
+            future = next(f for f in self.futures if f in done)
+        result = future.result()  # a failed future stays, so forcing this tail again raises again
+        self.futures.remove(future)
+        return Stream(result, self.next)
+
+
+def parallel_smap(func, stream, executor=None, prefetch=None):
+    """`streamtools.smap` computing up to ``prefetch`` upcoming elements on ``executor`` ahead of time
+
+    Output is in order. An exception raised by ``func`` is raised when its element is forced."""
+    return _ReadAhead(func, stream, executor, prefetch, ordered=True).next()
+
+
+def parallel_smap_unordered(func, stream, executor=None, prefetch=None):
+    """`parallel_smap` yielding results in the order they complete"""
+    return _ReadAhead(func, stream, executor, prefetch, ordered=False).next()
+
+
+class _Buffer:
+    """Bounded buffer between a producer thread and the stream pulling from it."""
+
+    def __init__(self, depth, policy):
+        if policy not in ('block', 'drop_newest', 'drop_oldest'):
+            raise ValueError(f"unknown policy {policy!r}")
+        self.items = collections.deque()
+        self.depth = depth
+        self.policy = policy
+        self.condition = threading.Condition()
+        self.finished = False
+        self.error = None
+        self.closed = False
+
+    def put(self, item):
+        """returns False once nobody will take items anymore"""
+        with self.condition:
+            if len(self.items) >= self.depth:
+                if self.policy == 'drop_newest':
+                    return not self.closed
+                if self.policy == 'drop_oldest':
+                    self.items.popleft()
+                while self.policy == 'block' and len(self.items) >= self.depth and not self.closed:
+                    self.condition.wait()
+            if self.closed:
+                return False
+            self.items.append(item)
+            self.condition.notify_all()
+            return True
+
+    def finish(self, error=None):
+        with self.condition:
+            self.finished = True
+            self.error = error
+            self.condition.notify_all()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.items.clear()
+            self.condition.notify_all()
+
+    def take(self, n):
+        """up to ``n`` items, waiting for at least one; empty when the source is exhausted"""
+        with self.condition:
+            while not self.items and not self.finished:
+                self.condition.wait()
+            if not self.items and self.error is not None:
+                raise self.error
+            items = tuple(self.items.popleft() for _ in range(min(n, len(self.items))))
+            self.condition.notify_all()
+            return items
+
+
+def _produce(it, buffer):
+    try:
+        for item in it:
+            if not buffer.put(item):
+                break
+        else:
+            buffer.finish()
+    except BaseException as e:
+        buffer.finish(e)
+    finally:
+        close = getattr(it, 'close', None)
+        if close is not None:
+            close()
+
+
+class _Prefetched:
+    """Consumer side of a `prefetch`; the producer stops once this is garbage collected."""
+
+    def __init__(self, buffer, chunk_size):
+        self.buffer = buffer
+        self.chunk_size = chunk_size
+
+    def next(self):
+        heads = self.buffer.take(self.chunk_size)
+        if not heads:
+            return None
+        return Stream.from_heads(heads, self.next)
+
+
+def prefetch(iterable, depth=64, policy='block', chunk_size=1):
+    """`Stream.from_iterable` with a producer thread reading up to ``depth`` elements ahead
+
+    ``policy`` is what the producer does when the buffer is full: ``'block'`` until there is room,
+    or drop elements, ``'drop_newest'`` or ``'drop_oldest'``.
+    With ``chunk_size > 1``, each forced tail takes up to that many buffered elements at once.
+    An exception raised by the source is raised when the element after the last one is forced."""
+    buffer = _Buffer(depth, policy)
+    consumer = _Prefetched(buffer, chunk_size)
+    weakref.finalize(consumer, buffer.close)
+    threading.Thread(target=_produce, args=(iter(iterable), buffer), daemon=True).start()
+    return consumer.next()
+
+
+_SHARDABLE = ('smap', 'sfilter', 'starmap')
+
+
+def _run_stages(pipeline, heads):
+    return tuple(pipeline.apply(heads))
+
+
+def _chunks(it, chunk_size):
+    while True:
+        chunk = tuple(itertools.islice(it, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _join(results, func, carry):
+    while results is not None and not results.head:
+        results = results.tail
+    if results is None:
+        return None
+    heads = results.head
+    if func is not None:
+        if carry is not None:
+            heads = tuple(func(carry[0], x) for x in heads)
+        carry = heads[-1],  # a 1-tuple, as the total can be None
+    return Stream.from_heads(heads, lambda: _join(results.tail, func, carry))
+
+
+def parallel_pipeline(pipeline, executor=None, chunk_size=1024, prefetch=None):
+    """`streamtools.Pipeline.stream` running the stages on chunks of ``chunk_size`` elements in ``executor``,
+    a process pool by default, with up to ``prefetch`` chunks in flight
+
+    Output is in order and chunked. The stages can be `smap`, `sfilter` and `starmap`, with functions
+    that can be pickled, and a last `accumulate` whose function must be associative: each chunk is
+    accumulated in the pool, then offset by the total of the chunks before it."""
+    stages = pipeline.stages
+    func = None
+    if stages and stages[-1][0] == 'accumulate':
+        func, = stages[-1][1]
+    if not all(name in _SHARDABLE for name, _ in (stages[:-1] if func is not None else stages)):
+        raise ValueError("only smap, sfilter and starmap stages, and a last accumulate, can run on separate chunks")
+    # the same stages without the source, which is not sent to the pool
+    shard = streamtools.Pipeline(None)
+    for name, args in stages:
+        shard = getattr(shard, name)(*args)
+    source = pipeline.source
+    chunks = Stream.from_iterable(_chunks(iter(()) if source is None else iter(source), chunk_size))
+    if executor is None:
+        executor = _get_default_process_executor()
+    results = _ReadAhead(partial(_run_stages, shard), chunks, executor, prefetch, ordered=True).next()
+    return _join(results, func, None)
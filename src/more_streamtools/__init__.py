@@ -1,3 +1,9 @@
+import collections
+import heapq
+import itertools
+import operator
+from functools import partial
+
 from streamtools import *
 
 
@@ -9,18 +15,25 @@ def prepend(value, stream):
     return Stream(value, stream)
 
 
+def append(stream, *values):
+    return chain(stream, Stream.from_heads(values))
+
+
+def reverse(stream):
+    heads = [] if stream is None else list(stream)
+    heads.reverse()
+    return Stream.from_heads(tuple(heads))
+
+
 def tabulate(function, start=0):
     return smap(function, count(start))
 
 
 def tail(n, stream):
-    pointers = []
-    p_stream = stream
-    while p_stream is not None:
-        pointers.append(p_stream)
-        if len(pointers) > n:
-            pointers.pop(0)
-        p_stream = p_stream.tail
+    pointers = collections.deque(maxlen=n)
+    while stream is not None:
+        pointers.append(stream)
+        stream = stream.tail
     if pointers:
         return pointers[0]
     return None
@@ -32,12 +45,11 @@ def all_equal(stream):
 
 
 def quantify(stream, pred=bool):
-    p = stream
-    c = 0
-    while p is not None:
-        c += bool(pred(p.head))
-        p = p.tail
-    return c
+    if stream is None:
+        return 0
+    it = iter(stream)
+    del stream  # do not keep the consumed prefix alive
+    return sum(map(bool, map(pred, it)))
 
 
 def pad_none(stream):
@@ -49,21 +61,30 @@ def ncycles(stream, n):
 
 
 def dotproduct(vec1, vec2):
-    return sum(smap(lambda x, y: x * y, vec1, vec2))
+    it1, it2 = iter(vec1), iter(vec2)
+    del vec1, vec2  # do not keep the consumed prefixes alive
+    return sum(map(operator.mul, it1, it2))
 
 
 def convolve(signal, kernel):
-    kernel = tuple(kernel)[::-1]
-    n = len(kernel)
-    kernel = Stream(*kernel)
-    signal = chain(repeat(0, n - 1), signal)
+    return Stream.from_iterable(_fir(signal, kernel, flush=True))
+
+
+def fir_filter(signal, kernel):
+    """`convolve` without the ``len(kernel) - 1`` outputs after the end of signal"""
+    return Stream.from_iterable(_fir(signal, kernel, flush=False))
 
-    def resolve(s):
-        if s is None:
-            return None
-        return Stream(dotproduct(s, kernel), lambda: resolve(s.tail))
 
-    return resolve(signal)
+def _fir(signal, kernel, flush):
+    kernel = tuple(kernel)[::-1]
+    n = len(kernel)
+    window = collections.deque([0] * n, maxlen=n)  # the last n samples
+    samples = iter(signal) if signal is not None else iter(())
+    if flush:
+        samples = itertools.chain(samples, itertools.repeat(0, n - 1))
+    for sample in samples:
+        window.append(sample)
+        yield sum(map(operator.mul, kernel, window))
 
 
 def flatten(stream_of_streams):
@@ -76,23 +97,40 @@ def repeatfunc(func, times=None, *args):
     return starmap(func, repeat(args, times))
 
 
-def pairwise(stream):
-    if stream is None:
-        return None
-    return szip(stream, stream.tail)
+def pairwise(stream, n=2):
+    """tuples of every ``n`` consecutive elements, `sliding_window` by another name"""
+    return sliding_window(stream, n)
+
+
+def sliding_window(stream, n):
+    return Stream.from_iterable(_sliding_window(stream, n))
+
+
+def _sliding_window(stream, n):
+    it = iter(stream) if stream is not None else iter(())
+    del stream
+    window = collections.deque(itertools.islice(it, n - 1), maxlen=n)
+    for x in it:
+        window.append(x)
+        yield tuple(window)
+
+
+def batched(stream, n):
+    """tuples of ``n`` elements, the last one may be shorter"""
+    return Stream.from_iterable(_batched(stream, n))
+
+
+def _batched(stream, n):
+    it = iter(stream) if stream is not None else iter(())
+    del stream
+    batch = tuple(itertools.islice(it, n))
+    while batch:
+        yield batch
+        batch = tuple(itertools.islice(it, n))
 
 
 def grouper(stream, n, fillvalue=None):
-    if stream is None:
-        return None
-    z = []
-    for _ in range(n):
-        if stream is None:
-            z.append(fillvalue)
-        else:
-            z.append(stream.head)
-            stream = stream.tail
-    return Stream(z, partial(grouper, stream, n, fillvalue))
+    return Stream.from_iterable([*batch, *[fillvalue] * (n - len(batch))] for batch in _batched(stream, n))
 
 
 def roundrobin(*streams):
@@ -108,12 +146,9 @@ def partition(predicate, stream):
     return filterfalse(predicate, stream), sfilter(predicate, stream)
 
 
-@Stream.from_generator_function
 def powerset(stream):
-    length = len(list(stream))
-    for r in range(length + 1):
-        for c in combinations(stream, r):
-            yield c
+    pool = tuple(stream)
+    return chain_from_streams(smap(partial(combinations, pool), Stream.from_iterable(range(len(pool) + 1))))
 
 
 def unique_everseen(stream, key=None):
@@ -158,3 +193,53 @@ def first_true(stream, default=False, predicate=None):
         return default
     else:
         return n.head
+
+
+def _iter(stream):
+    return iter(()) if stream is None else iter(stream)
+
+
+def merge(*streams, key=None):
+    """all elements of sorted ``streams``, sorted, with a heap of their next elements"""
+    return Stream.from_iterable(heapq.merge(*map(_iter, streams), key=key))
+
+
+def _dedupe(it, key):
+    return map(next, map(operator.itemgetter(1), itertools.groupby(it, key)))
+
+
+def dedupe_sorted(stream, key=None):
+    return Stream.from_iterable(_dedupe(_iter(stream), key))
+
+
+def union(*streams, key=None):
+    return Stream.from_iterable(_dedupe(heapq.merge(*map(_iter, streams), key=key), key))
+
+
+def intersection(*streams, key=None):
+    merged = heapq.merge(*(_dedupe(_iter(s), key) for s in streams), key=key)
+    return Stream.from_iterable(_in_all(merged, key, len(streams)))
+
+
+def _in_all(merged, key, n):
+    for _, group in itertools.groupby(merged, key):
+        first = next(group)
+        if sum(1 for _ in group) == n - 1:
+            yield first
+
+
+def difference(stream, *others, key=None):
+    return Stream.from_iterable(_difference(_iter(stream), heapq.merge(*map(_iter, others), key=key), key))
+
+
+def _difference(it, others, key):
+    if key is None:
+        key = lambda x: x
+    end = object()
+    other = next(others, end)
+    for x in it:
+        k = key(x)
+        while other is not end and key(other) < k:
+            other = next(others, end)
+        if other is end or k < key(other):
+            yield x
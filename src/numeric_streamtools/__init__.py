@@ -0,0 +1,240 @@
+"""streamtools for numbers, working on whole array blocks
+
+Streams built here are `ChunkedStream`s whose chunks are `numpy.ndarray`s when NumPy is installed,
+or `array.array`s otherwise, so they can be used anywhere a `Stream` can.
+Any stream is accepted as input, its chunks are reused as blocks when possible."""
+import array
+import itertools
+import operator
+from functools import partial
+
+from sicp_streams import Stream, ChunkedStream
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+BLOCK_SIZE = 1024  # pragma: no mutate
+
+
+def _as_array(values, typecode):
+    if numpy is not None:
+        if isinstance(values, numpy.ndarray):
+            return values
+        return numpy.asarray(values, dtype=typecode)
+    if isinstance(values, array.array) and values.typecode == typecode:
+        return values
+    return array.array(typecode, values)
+
+
+def _blocks(stream, typecode='d', block_size=BLOCK_SIZE):
+    while stream is not None:
+        if type(stream) is ChunkedStream:
+            yield _as_array(stream.chunk, typecode)
+            stream = stream.rest
+            continue
+        values = []
+        while stream is not None and type(stream) is not ChunkedStream and len(values) < block_size:
+            values.append(stream.head)
+            stream = stream.tail
+        yield _as_array(values, typecode)
+
+
+def _from_blocks(blocks):
+    for block in blocks:
+        if len(block):
+            return Stream.from_heads(block, partial(_from_blocks, blocks))
+    return None
+
+
+def from_iterable(iterable, typecode='d', block_size=BLOCK_SIZE):
+    it = iter(iterable)
+
+    def blocks():
+        while True:
+            block = array.array(typecode, itertools.islice(it, block_size))
+            if not block:
+                return
+            yield block if numpy is None else numpy.frombuffer(block, dtype=typecode)
+
+    return _from_blocks(blocks())
+
+
+def smap(func, stream, typecode='d', vectorized=None):
+    """``vectorized`` tells whether ``func`` can take a whole ndarray, by default only for NumPy ufuncs"""
+    if vectorized is None:
+        vectorized = numpy is not None and isinstance(func, numpy.ufunc)
+
+    def blocks():
+        for block in _blocks(stream, typecode):
+            if vectorized and numpy is not None:
+                yield numpy.asarray(func(block))
+            elif numpy is not None:
+                yield numpy.fromiter(map(func, block), dtype=typecode, count=len(block))
+            else:
+                yield array.array(typecode, map(func, block))
+
+    return _from_blocks(blocks())
+
+
+def _ufunc(func):
+    if numpy is None:
+        return None
+    if isinstance(func, numpy.ufunc):
+        return func
+    return {
+        operator.add: numpy.add,
+        operator.mul: numpy.multiply,
+        max: numpy.maximum,
+        min: numpy.minimum,
+    }.get(func)
+
+
+def accumulate(stream, func=operator.add, *, initial=None, typecode='d'):
+    ufunc = _ufunc(func)
+
+    def blocks():
+        carry = initial
+        if carry is not None:
+            yield _as_array([carry], typecode)
+        for block in _blocks(stream, typecode):
+            if carry is None:
+                carry = block[0]
+                block = block[1:]
+                yield _as_array([carry], typecode)
+            if ufunc is not None:
+                # accumulating from carry keeps the same order of operations as the sequential version
+                block = ufunc.accumulate(numpy.concatenate((numpy.asarray([carry], dtype=block.dtype), block)))[1:]
+            elif numpy is not None:
+                block = numpy.fromiter(itertools.accumulate(itertools.chain((carry,), block), func),
+                                       dtype=typecode, count=len(block) + 1)[1:]
+            else:
+                block = array.array(typecode, itertools.accumulate(itertools.chain((carry,), block), func))[1:]
+            if len(block):
+                carry = block[-1]
+                yield block
+
+    return _from_blocks(blocks())
+
+
+def _aligned_blocks(*streams, typecode='d'):
+    """blocks of the same length from each stream, until the shortest one ends"""
+    iterators = [_blocks(s, typecode) for s in streams]
+    pending = [()] * len(streams)
+    while True:
+        for i, it in enumerate(iterators):
+            while not len(pending[i]):
+                block = next(it, None)
+                if block is None:
+                    return
+                pending[i] = block
+        n = min(len(block) for block in pending)
+        yield tuple(block[:n] for block in pending)
+        pending = [block[n:] for block in pending]
+
+
+def dotproduct(vec1, vec2, typecode='d'):
+    total = 0
+    for a, b in _aligned_blocks(vec1, vec2, typecode=typecode):
+        if numpy is not None:
+            total += numpy.dot(a, b)
+        else:
+            total += sum(map(operator.mul, a, b))
+    return total
+
+
+# about where FFT starts to beat the direct method on 1024 sample chunks, and it already does on smaller ones
+FFT_THRESHOLD = 256  # pragma: no mutate
+
+
+def convolve(signal, kernel, typecode='d', method=None):
+    """the full convolution, as `more_streamtools.convolve`
+
+    ``method`` is ``'direct'`` or ``'fft'`` (overlap-add per block, needs NumPy).
+    By default FFT is used for kernels of at least `FFT_THRESHOLD` taps when NumPy is installed."""
+    kernel = _as_array(tuple(kernel), typecode)
+    n = len(kernel)
+    if method is None:
+        method = 'fft' if numpy is not None and n >= FFT_THRESHOLD else 'direct'
+    if method == 'fft':
+        if numpy is None:
+            raise ValueError("method='fft' requires NumPy")
+        return _from_blocks(_fft_convolve_blocks(signal, kernel, typecode))
+    if method != 'direct':
+        raise ValueError(f"unknown method {method!r}")
+    reversed_kernel = kernel[::-1]
+
+    def window_sums(history):
+        if numpy is not None:
+            return numpy.convolve(history, kernel, 'valid')
+        return array.array(typecode, (sum(map(operator.mul, reversed_kernel, history[i:i + n]))
+                                      for i in range(len(history) - n + 1)))
+
+    def blocks():
+        zeros = _as_array([0] * (n - 1), typecode)
+        history = zeros
+        for block in _blocks(signal, typecode):
+            history = history[len(history) - (n - 1):] + block if numpy is None else \
+                numpy.concatenate((history[len(history) - (n - 1):], block))
+            yield window_sums(history)
+        if history is not zeros:
+            yield window_sums(history[len(history) - (n - 1):] + zeros if numpy is None else
+                              numpy.concatenate((history[len(history) - (n - 1):], zeros)))
+
+    return _from_blocks(blocks())
+
+
+def _segments(blocks, length):
+    """``blocks`` cut and joined into arrays of ``length`` values, the last one shorter"""
+    pending = []
+    count = 0
+    for block in blocks:
+        while len(block):
+            head = block[:length - count]
+            pending.append(head)
+            count += len(head)
+            block = block[len(head):]
+            if count == length:
+                yield numpy.concatenate(pending)
+                pending = []
+                count = 0
+    if count:
+        yield numpy.concatenate(pending)
+
+
+def _fft_convolve_blocks(signal, kernel, typecode):
+    n = len(kernel)
+    # one FFT size for the whole signal, re-blocked to fill it: the size of the incoming chunks would
+    # make small chunks pay for a transform of at least twice the kernel each
+    size = 1 << (max(n, BLOCK_SIZE) + n - 2).bit_length()
+    length = size - n + 1
+    kernel_spectrum = numpy.fft.rfft(kernel, size)
+    overlap = numpy.zeros(n - 1)
+    started = False
+    for segment in _segments(_blocks(signal, typecode), length):
+        started = True
+        out = numpy.fft.irfft(numpy.fft.rfft(segment, size) * kernel_spectrum, size)[:len(segment) + n - 1]
+        out[:n - 1] += overlap
+        overlap = out[len(segment):]
+        yield out[:len(segment)]
+    if started:
+        yield overlap
+
+
+def diff(stream, typecode='d'):
+    """differences between consecutive elements, ``pairwise`` followed by subtraction"""
+
+    def blocks():
+        previous = None
+        for block in _blocks(stream, typecode):
+            if previous is None:
+                previous, block = block[0], block[1:]
+            if numpy is not None:
+                yield numpy.diff(block, prepend=previous)
+            else:
+                yield array.array(typecode, map(operator.sub, block, itertools.chain((previous,), block)))
+            if len(block):
+                previous = block[-1]
+
+    return _from_blocks(blocks())
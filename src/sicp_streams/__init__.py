@@ -1,10 +1,24 @@
+import collections
 import functools
+import io
+import itertools
+import mmap
+import operator
+import os
+import pickle
+import re
+import struct
+import tempfile
 import threading
+import types
 import typing
+import weakref
 from functools import partial
 
 _ST = typing.TypeVar('_ST')  # pragma: no mutate
 
+_repr_local = threading.local()  # ids of the streams being repr'd by the current thread
+
 
 class StreamMeta(type):
     def __instancecheck__(self, other):
@@ -13,10 +27,114 @@ class StreamMeta(type):
         return super().__instancecheck__(other)
 
 
-class Stream(typing.Generic[_ST], metaclass=StreamMeta):
-    __slots__ = ('_head', '_tail', '_tlocal')
+class _Delayed:
+    """Pending tail of a `Stream`, forced at most once even if several threads ask for it.
+
+    Only the pending node refers to it, so the lock is dropped together with the thunk."""
+    __slots__ = ('_func', '_value', '_lock')
+
+    def __init__(self, func):
+        self._func = func
+        self._value = None
+        self._lock = threading.RLock()
+
+    def __call__(self):
+        if type(self._func) is Trampoline:
+            return _force_trampolined(self)
+        with self._lock:
+            if self._func is not None:
+                self._set(self._func())
+        return self._value
+
+    def _set(self, value):
+        if not (value is None or isinstance(value, Stream)):
+            value = Stream(value)
+        self._value = value
+        self._func = None
+
+    def __repr__(self):
+        if self._func is None:
+            return repr(self._value)
+        return repr(self._func)
+
+
+class Trampoline:
+    """A tail thunk that asks for other tails instead of forcing them itself.
 
-    _eq_detect_limit: typing.ClassVar[int] = 500  # pragma: no mutate
+    ``func(*args)`` must return a generator. ``yield node`` suspends it until ``node.tail`` is
+    forced, and that tail is sent back in. The value it returns becomes the tail.
+    Nested trampolines are forced from an explicit stack rather than the Python call stack,
+    so deeply nested combinators do not hit the recursion limit."""
+    __slots__ = ('func', 'args')
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def __call__(self):
+        generator = self.func(*self.args)
+        value = None
+        try:
+            while True:
+                value = generator.send(value).tail
+        except StopIteration as stop:
+            return stop.value
+
+    def __repr__(self):
+        return f"{self.__class__.__module__}.{self.__class__.__name__}({self.func!r}, *{self.args!r})"
+
+
+def _force_trampolined(root):
+    stack = []  # [delayed, generator, node whose tail it waits for], each delayed is locked
+    delayed, value, error = root, None, None
+    while True:
+        if delayed is not None:
+            if type(delayed._func) is Trampoline:
+                delayed._lock.acquire()
+                if delayed._func is None:  # forced by another thread meanwhile
+                    value = delayed._value
+                    delayed._lock.release()
+                else:
+                    stack.append([delayed, delayed._func.func(*delayed._func.args), None])
+                    value = None
+            else:
+                try:
+                    value = delayed()
+                except BaseException as e:
+                    error = e
+            delayed = None
+        if not stack:
+            if error is not None:
+                raise error
+            return value
+        frame = stack[-1]
+        generator, waiting = frame[1], frame[2]
+        try:
+            if error is not None:
+                error, e = None, error
+                node = generator.throw(e)
+            else:
+                if waiting is not None:
+                    waiting._tail = value
+                node = generator.send(value)
+        except StopIteration as stop:
+            frame[0]._set(stop.value)
+            value = frame[0]._value
+        except BaseException as e:
+            error = e
+        else:
+            frame[2] = node
+            if type(node._tail) is _Delayed:
+                delayed = node._tail
+            else:
+                value = node._tail
+            continue
+        stack.pop()
+        frame[0]._lock.release()
+
+
+class Stream(typing.Generic[_ST], metaclass=StreamMeta):
+    __slots__ = ('_head', '_tail', '__weakref__')
 
     def __init__(self, head, *args):
         if args:
@@ -25,11 +143,12 @@ class Stream(typing.Generic[_ST], metaclass=StreamMeta):
             more_heads = tail = None
         self._head = head
         if more_heads:
-            self._tail = partial(Stream, *more_heads, tail)
-        else:
-            self._tail = tail
-        self._tlocal = threading.local()
-        self._tlocal.repr = False
+            tail = partial(Stream, *more_heads, tail)
+        if callable(tail):
+            tail = _Delayed(tail)
+        elif not (tail is None or isinstance(tail, Stream)):
+            tail = Stream(tail)
+        self._tail = tail
 
     @property
     def head(self) -> _ST:
@@ -37,21 +156,18 @@ class Stream(typing.Generic[_ST], metaclass=StreamMeta):
 
     @property
     def tail(self) -> 'typing.Union[Stream[_ST], None]':
-        if callable(self._tail):
-            self._tail = self._tail()
-        if not (self._tail is None or isinstance(self._tail, Stream)):
-            self._tail = Stream(self._tail)
-        return self._tail
-
-    def __iter__(self) -> typing.Iterable[_ST]:
-        y = self
-        while y is not None:
-            yield y.head
-            y = y.tail
+        tail = self._tail
+        if type(tail) is _Delayed:
+            tail = self._tail = tail()
+        return tail
+
+    def __iter__(self) -> typing.Iterator[_ST]:
+        # the generator only refers to the node it is at, so the consumed prefix can be collected
+        return _iterate(self)
 
     def __eq__(self, other: 'typing.Union[Stream[_ST], None]'):
         """use with caution: it will try to drain the stream.
-        If both streams are long enough, it will raise RecursionError"""
+        Infinite streams only compare equal if they end up in a cycle, otherwise it never returns"""
         if self is other:
             return True
         if other is None:
@@ -59,55 +175,128 @@ class Stream(typing.Generic[_ST], metaclass=StreamMeta):
         if not isinstance(other, Stream):
             return NotImplemented
 
-        pointer_self = self
-        ps_self = [self]
-        pointer_other = other
-        ps_other = [other]
-        count = 0
+        # Brent's cycle detection on the pair of pointers
+        pointer_self, pointer_other = self, other
+        saved_self = saved_other = None
+        steps = power = 1
         while True:
-            if pointer_self is pointer_other:
+            if _same_node(pointer_self, pointer_other):
                 return True
             if pointer_self is None or pointer_other is None:
                 return False
-            if pointer_self.head != pointer_other.head:
-                return False
-            pointer_self = pointer_self.tail
-            pointer_other = pointer_other.tail
-            count += 1
-            for hp_self, hp_other in zip(ps_self, ps_other):
-                if pointer_self is hp_self and pointer_other is hp_other:
-                    return True
-            ps_self.append(pointer_self)
-            ps_other.append(pointer_other)
-            if count > self._eq_detect_limit:
-                raise RecursionError
+            if type(pointer_self) is ChunkedStream and type(pointer_other) is ChunkedStream:
+                n = min(len(pointer_self._heads) - pointer_self._index,
+                        len(pointer_other._heads) - pointer_other._index)
+                if any(map(operator.ne,
+                           pointer_self._heads[pointer_self._index:pointer_self._index + n],
+                           pointer_other._heads[pointer_other._index:pointer_other._index + n])):
+                    return False
+                pointer_self = pointer_self._skip(n)
+                pointer_other = pointer_other._skip(n)
+            else:
+                if pointer_self.head != pointer_other.head:
+                    return False
+                pointer_self = pointer_self.tail
+                pointer_other = pointer_other.tail
+            if _same_node(pointer_self, saved_self) and _same_node(pointer_other, saved_other):
+                return True
+            if steps == power:
+                saved_self, saved_other = pointer_self, pointer_other
+                power *= 2
+                steps = 0
+            steps += 1
+
+    def __hash__(self):
+        """hash of the heads, consistent with ``==``.
+        Only a finite stream forced to its end is hashable, otherwise it raises TypeError"""
+        value = 0
+        pointer, saved = self, self
+        steps = power = 1
+        while True:
+            if type(pointer) is ChunkedStream:
+                for head in itertools.islice(pointer._heads, pointer._index, len(pointer._heads) - 1):
+                    value = hash((value, head))
+                pointer = pointer._last
+            value = hash((value, pointer._head))
+            tail = pointer._tail
+            if type(tail) is _Delayed:
+                if tail._func is not None:
+                    raise TypeError("unhashable Stream: not forced to its end")
+                tail = tail._value
+            pointer = tail
+            if pointer is None:
+                return value
+            if _same_node(pointer, saved):
+                raise TypeError("unhashable Stream: infinite")
+            if steps == power:
+                saved = pointer
+                power *= 2
+                steps = 0
+            steps += 1
+
+    def __reduce__(self):
+        # the forced prefix goes as one flat list of heads, not as a chain of nested nodes
+        heads, tail, cycle = _forced_prefix(self)
+        if tail is not None:
+            _check_picklable(tail)
+        return _unpickle_stream, (heads, tail, cycle)
 
     def __repr__(self):
-        if self._tlocal.repr:
+        visiting = getattr(_repr_local, 'visiting', None)
+        if visiting is None:
+            visiting = _repr_local.visiting = set()
+        if id(self) in visiting:
             return f"{self.__class__.__module__}.{self.__class__.__name__}(...)"
         try:
-            self._tlocal.repr = True
+            visiting.add(id(self))
             return f"{self.__class__.__module__}.{self.__class__.__name__}({self._head!r}, {self._tail!r})"
         finally:
-            self._tlocal.repr = False
+            visiting.discard(id(self))
 
     def __getitem__(self, item):
+        if isinstance(item, slice):
+            if item.step == 0:
+                raise ValueError("slice step cannot be zero")
+            start, stop, step = item.start or 0, item.stop, item.step or 1
+            if start < 0 or (stop is not None and stop < 0) or step <= 0:
+                raise ValueError
+            return Stream.from_iterable(itertools.islice(self, start, stop, step))
         if item < 0:
             raise ValueError
 
         pointer = self
-        while pointer.tail is not None and item > 0:
+        while item > 0:
+            if type(pointer) is ChunkedStream:
+                item += pointer._index
+                if item < len(pointer._heads) - 1:
+                    return pointer._heads[item]
+                item -= len(pointer._heads) - 1
+                pointer = pointer._last
+                continue
+            if pointer.tail is None:
+                raise IndexError("stream index out of range")
             pointer = pointer.tail
             item -= 1
-        if item == 0:
-            return pointer.head
-        elif pointer.tail is None:
-            raise IndexError("stream index out of range")
+        return pointer.head
 
     @classmethod
-    def from_iterable(cls, iterable: typing.Iterable[_ST]) -> 'typing.Union[Stream[_ST], None]':
-        """should consume the iterable"""
+    def from_iterable(cls, iterable: typing.Iterable[_ST], chunk_size: int = 1,
+                      spill: 'typing.Optional[SpillFile]' = None) -> 'typing.Union[Stream[_ST], None]':
+        """should consume the iterable
+
+        with ``chunk_size > 1``, every forced tail pulls up to ``chunk_size`` elements at once
+        and stores them in one `ChunkedStream`; with a `SpillFile` as ``spill`` too,
+        the chunks that were not used lately are written to disk and read back when needed"""
         it = iter(iterable)
+        if chunk_size > 1:
+            heads = tuple(itertools.islice(it, chunk_size))
+            if not heads:
+                return None
+            if spill is not None:
+                heads = _SpillableHeads(spill, heads)
+            return cls.from_heads(heads, partial(cls.from_iterable, it, chunk_size, spill))
+        if spill is not None:
+            raise ValueError("spilling needs a chunk_size above 1")
         try:
             n = next(it)
         except StopIteration:
@@ -115,6 +304,17 @@ class Stream(typing.Generic[_ST], metaclass=StreamMeta):
         else:
             return cls(n, partial(cls.from_iterable, it))
 
+    @staticmethod
+    def from_heads(heads: typing.Sequence[_ST], tail=None) -> 'typing.Union[Stream[_ST], None]':
+        """a stream of all elements in ``heads`` followed by ``tail``, sharing one chunk
+
+        ``heads`` should be an immutable sequence (tuple, or an array that is never written again)"""
+        if len(heads) == 0:
+            return tail() if callable(tail) else tail
+        if len(heads) == 1:
+            return Stream(heads[0], tail)
+        return ChunkedStream(heads, 0, Stream(heads[-1], tail))
+
     @classmethod
     def from_generator_function(
             cls, generator_function: typing.Callable[..., typing.Iterable[_ST]]
@@ -125,3 +325,582 @@ class Stream(typing.Generic[_ST], metaclass=StreamMeta):
             return cls.from_iterable(generator)
 
         return wrapped
+
+    @classmethod
+    def from_mmap(cls, source, *, size: 'typing.Optional[int]' = None, prefix=None, delimiter: bytes = b'\n',
+                  chunk_size: int = 1024) -> 'typing.Union[Stream[memoryview], None]':
+        """records of a memory-mapped file, as `memoryview` slices of the mapping, without copying
+
+        ``source`` is a path, a binary file or an object supporting the buffer protocol, such as an `mmap.mmap`;
+        a file without a descriptor to map, such as an `io.BytesIO`, is read like `Stream.from_file` does.
+        Records are ``size`` bytes long if given, or prefixed with their length packed as the `struct`
+        format ``prefix``, otherwise they end with ``delimiter`` (included, like the lines of a binary file).
+        Every forced tail slices up to ``chunk_size`` records; a forced stream never reads the file again"""
+        prefix = _as_struct(prefix)
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as file:
+                return cls.from_mmap(file, size=size, prefix=prefix, delimiter=delimiter, chunk_size=chunk_size)
+        if hasattr(source, 'fileno'):
+            try:
+                fileno = source.fileno()
+            except io.UnsupportedOperation:
+                # a file without a descriptor to map, such as `io.BytesIO`
+                return cls.from_file(source, size=size, prefix=prefix, delimiter=delimiter, chunk_size=chunk_size)
+            if os.fstat(fileno).st_size == 0:
+                return None
+            source = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+        return cls.from_iterable(_records(source, size, prefix, delimiter, True), chunk_size)
+
+    @classmethod
+    def from_file(cls, file, *, size: 'typing.Optional[int]' = None, prefix=None, delimiter: bytes = b'\n',
+                  chunk_size: int = 1024, buffer_size: int = 1 << 20) -> 'typing.Union[Stream[memoryview], None]':
+        """records of a file read sequentially, for the files that cannot be memory-mapped (pipes, sockets,
+        compressed files), see `Stream.from_mmap` for ``size``, ``prefix`` and ``delimiter``
+
+        ``file`` is a path or a binary file, read ``buffer_size`` bytes at a time;
+        the records are `memoryview` slices of those blocks"""
+        prefix = _as_struct(prefix)
+        return cls.from_iterable(_file_records(file, size, prefix, delimiter, buffer_size), chunk_size)
+
+    @staticmethod
+    def to_file(stream: 'typing.Union[Stream[bytes], None]', file, *, prefix=None,
+                buffer_size: int = 1 << 20) -> int:
+        """writes the records of ``stream`` to a path or a binary file, ``buffer_size`` bytes at a time,
+        each one after its length packed as the `struct` format ``prefix`` if given; returns the bytes written
+
+        Only refers to the record it is at, a stream nobody else holds is written in bounded memory"""
+        prefix = _as_struct(prefix)
+        records = _iterate(stream)
+        del stream
+        if isinstance(file, (str, os.PathLike)):
+            with open(file, 'wb') as f:
+                return _write_records(records, f, prefix, buffer_size)
+        return _write_records(records, file, prefix, buffer_size)
+
+    @staticmethod
+    def memoize(func=None, *, maxsize: 'typing.Optional[int]' = 128, key: str = 'identity'):
+        """caches the streams returned by ``func``, like `functools.lru_cache`
+
+        With ``key='identity'`` stream arguments are told apart by identity and only weakly referred to,
+        an entry goes away with them (a result keeps them alive only until its pending tail is forced);
+        with ``key='value'`` they are compared by value, which needs them to be hashable (forced to their end).
+        At most ``maxsize`` entries are kept, the least recently used are evicted first.
+        Usable as ``@Stream.memoize`` or ``@Stream.memoize(maxsize=...)``, on methods too,
+        where ``self`` is part of the key and so needs to be hashable"""
+        if key not in ('identity', 'value'):
+            raise ValueError(f"key should be 'identity' or 'value', not {key!r}")
+        if func is None:
+            return partial(Stream.memoize, maxsize=maxsize, key=key)
+        return _Memoized(func, maxsize, key == 'value')
+
+
+CacheInfo = collections.namedtuple('CacheInfo', 'hits misses maxsize currsize')
+
+
+class _Memoized:
+    def __init__(self, func, maxsize, by_value):
+        functools.update_wrapper(self, func)
+        self._func = func
+        self._maxsize = maxsize
+        self._by_value = by_value
+        self._cache = collections.OrderedDict()  # key -> (result, weak references to the argument streams)
+        self._lock = threading.RLock()
+        # keys whose argument died, appended by weakref callbacks that may run in the middle of any
+        # cache operation, and removed at the next call, like `weakref.WeakValueDictionary` does
+        self._pending_removals = []
+        self._hits = self._misses = 0
+
+    def _key(self, args, kwargs):
+        streams = []
+        key = []
+        for arg in itertools.chain(args, *kwargs.items()):
+            if not self._by_value and arg is not None and isinstance(arg, Stream):
+                streams.append(arg)
+                arg = (Stream, id(arg))
+            key.append(arg)
+        if kwargs:
+            key.insert(len(args), _KWARGS)
+        return tuple(key), streams
+
+    def _remove_pending(self):
+        while self._pending_removals:
+            key, ref = self._pending_removals.pop()
+            entry = self._cache.get(key)
+            if entry is not None and ref in entry[1]:
+                del self._cache[key]
+
+    def __call__(self, *args, **kwargs):
+        key, streams = self._key(args, kwargs)
+        with self._lock:
+            self._remove_pending()
+            entry = self._cache.get(key)
+            if entry is not None and all(ref() is stream for ref, stream in zip(entry[1], streams)):
+                self._cache.move_to_end(key)
+                self._hits += 1
+                return entry[0]
+            self._misses += 1
+        # not locked, ``func`` may well call itself
+        result = self._func(*args, **kwargs)
+        pending = self._pending_removals
+        refs = tuple(weakref.ref(stream, lambda ref, key=key: pending.append((key, ref))) for stream in streams)
+        with self._lock:
+            self._cache[key] = result, refs
+            self._cache.move_to_end(key)
+            if self._maxsize is not None and len(self._cache) > self._maxsize:
+                self._cache.popitem(last=False)
+        return result
+
+    def __get__(self, instance, owner=None):
+        return self if instance is None else types.MethodType(self, instance)
+
+    def cache_info(self) -> CacheInfo:
+        with self._lock:
+            self._remove_pending()
+            return CacheInfo(self._hits, self._misses, self._maxsize, len(self._cache))
+
+    def cache_clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._hits = self._misses = 0
+
+
+_KWARGS = object()  # separates positional arguments from keyword arguments in a cache key
+
+
+class SpillFile:
+    """Temporary file for the chunks of the streams built by ``Stream.from_iterable(..., spill=...)``.
+
+    Only the ``window`` most recently used chunks stay in memory; the others are pickled into the file
+    the first time they leave it, and loaded back whenever they are used again, so their elements
+    must be picklable. The file, created in ``directory``, grows as long as the `SpillFile` lives."""
+
+    def __init__(self, window: int = 16, directory: 'typing.Optional[str]' = None):
+        if window < 1:
+            raise ValueError("window should be at least 1")
+        self.window = window
+        self._directory = directory
+        self._file = None
+        self._resident = collections.OrderedDict()  # id -> chunk holding its heads, least recently used first
+        self._lock = threading.RLock()
+        self.writes = self.reads = 0
+
+    def _use(self, chunk):
+        with self._lock:
+            heads = chunk._heads
+            if heads is None:
+                self._file.seek(chunk._offset)
+                heads = chunk._heads = pickle.loads(self._file.read(chunk._size))
+                self.reads += 1
+            resident = self._resident
+            resident[id(chunk)] = chunk
+            resident.move_to_end(id(chunk))
+            while len(resident) > self.window:
+                self._spill(resident.popitem(last=False)[1])
+            return heads
+
+    def _spill(self, chunk):
+        if chunk._offset is None:
+            if self._file is None:
+                self._file = tempfile.TemporaryFile(dir=self._directory)
+            data = pickle.dumps(chunk._heads, pickle.HIGHEST_PROTOCOL)
+            chunk._offset = self._file.seek(0, os.SEEK_END)
+            chunk._size = len(data)
+            self._file.write(data)
+            self.writes += 1
+        chunk._heads = None  # an unchanged copy is in the file already
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+
+
+class _SpillableHeads:
+    """The heads of one chunk, either in memory or in a `SpillFile`"""
+    __slots__ = ('_spill_file', '_heads', '_length', '_offset', '_size')
+
+    def __init__(self, spill_file, heads):
+        self._spill_file = spill_file
+        self._heads = heads
+        self._length = len(heads)
+        self._offset = self._size = None
+        spill_file._use(self)
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, item):
+        return self._spill_file._use(self)[item]
+
+    def __iter__(self):
+        return iter(self._spill_file._use(self))
+
+
+class ChunkedStream(Stream[_ST]):
+    """A node inside a chunk of heads that were forced together.
+
+    Only the last node of a chunk is an ordinary `Stream` holding the rest of the stream;
+    the nodes before it are views into ``heads``, created one at a time when walking with ``tail``.
+    `Stream.__iter__`, `Stream.__getitem__` and the combinators in `streamtools` read
+    the chunk directly instead."""
+    __slots__ = ('_heads', '_index', '_last')
+
+    def __init__(self, heads, index, last):
+        if index + 2 < len(heads):
+            tail = partial(ChunkedStream, heads, index + 1, last)
+        else:
+            tail = last
+        super().__init__(heads[index], tail)
+        self._heads = heads
+        self._index = index
+        self._last = last
+
+    @property
+    def chunk(self) -> typing.Sequence[_ST]:
+        """heads from this node to the end of the chunk"""
+        return self._heads[self._index:]
+
+    @property
+    def rest(self) -> 'typing.Union[Stream[_ST], None]':
+        """the stream after the chunk"""
+        return self._last.tail
+
+    def _skip(self, n):
+        """the node ``n`` heads ahead, at most right after the chunk, without walking the views between"""
+        index = self._index + n
+        if index == len(self._heads):
+            return self.rest
+        if index == len(self._heads) - 1:
+            return self._last
+        return ChunkedStream(self._heads, index, self._last)
+
+
+def _as_struct(prefix):
+    return struct.Struct(prefix) if isinstance(prefix, (str, bytes)) else prefix
+
+
+def _records(buffer, size, prefix, delimiter, final):
+    """slices of ``buffer`` from one record to the next, returns where the incomplete last one starts
+    (an error if ``final``, except for a last line without its delimiter)"""
+    # records count bytes, whatever the format of the buffer's items
+    view = memoryview(buffer).cast('B')
+    n = len(view)
+    if size is not None:
+        pos = n - n % size
+        # slicing is driven by `map`, not by a Python loop per record
+        yield from map(view.__getitem__, map(slice, range(0, pos, size), range(size, pos + 1, size)))
+    elif prefix is not None:
+        pos = 0
+        while pos + prefix.size <= n:
+            length, = prefix.unpack_from(view, pos)
+            end = pos + prefix.size + length
+            if end > n:
+                break
+            yield view[pos + prefix.size:end]
+            pos = end
+    else:
+        pos = 0
+        if hasattr(buffer, 'find'):
+            find = buffer.find
+        else:
+            # `re` searches any buffer in place, where `memoryview` and `array.array` have no `find`
+            search = re.compile(re.escape(delimiter)).search
+            def find(sub, start):
+                match = search(view, start)
+                return -1 if match is None else match.start()
+        while pos < n:
+            end = find(delimiter, pos)
+            if end < 0:
+                if not final:
+                    break
+                end = n
+            else:
+                end += len(delimiter)
+            yield view[pos:end]
+            pos = end
+    if final and pos < n:
+        raise ValueError(f"{n - pos} bytes after the last complete record")
+    return pos
+
+
+def _file_records(file, size, prefix, delimiter, buffer_size):
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, 'rb') as f:
+            yield from _file_records(f, size, prefix, delimiter, buffer_size)
+        return
+    rest = b''
+    while True:
+        block = file.read(buffer_size)
+        buffer = rest + block if rest else block
+        pos = yield from _records(buffer, size, prefix, delimiter, not block)
+        if not block:
+            return
+        rest = buffer[pos:]
+
+
+def _write_records(records, file, prefix, buffer_size):
+    buffer = bytearray()
+    written = 0
+    for record in records:
+        if prefix is not None:
+            buffer += prefix.pack(memoryview(record).nbytes)
+        buffer += record
+        if len(buffer) >= buffer_size:
+            written += file.write(buffer)
+            buffer.clear()
+    if buffer:
+        written += file.write(buffer)
+    return written
+
+
+def _segment(node):
+    """the heads from ``node`` to the end of its chunk (just its own head if it is not in one),
+    and what follows them: a node, ``None`` or a pending `_Delayed`"""
+    if type(node) is ChunkedStream:
+        heads = itertools.islice(node._heads, node._index, None)
+        node = node._last
+    else:
+        heads = (node._head,)
+    tail = node._tail
+    if type(tail) is _Delayed and tail._func is None:
+        tail = tail._value
+    return heads, tail
+
+
+def _forced_prefix(stream):
+    """the heads forced so far, what follows them (``None`` or the thunk of the pending tail),
+    and the index of the head a cyclic stream goes back to"""
+    heads = []
+    append = heads.append
+    # Brent's cycle detection over the segments, as in `Stream.__eq__`
+    pointer, saved = stream, None
+    steps = power = 1
+    while True:
+        if type(pointer) is ChunkedStream:
+            heads.extend(itertools.islice(pointer._heads, pointer._index, None))
+            pointer = pointer._last
+        else:
+            append(pointer._head)
+        pointer = pointer._tail
+        if type(pointer) is _Delayed:
+            if pointer._func is not None:
+                return heads, pointer._func, None
+            pointer = pointer._value
+        if pointer is None:
+            return heads, None, None
+        if _same_node(pointer, saved):
+            break
+        if steps == power:
+            saved = pointer
+            power *= 2
+            steps = 0
+        steps += 1
+    # a cycle of ``steps`` segments, find where it starts
+    ahead = stream
+    for _ in range(steps):
+        ahead = _segment(ahead)[1]
+    heads = []
+    pointer = stream
+    while not _same_node(pointer, ahead):
+        segment, pointer = _segment(pointer)
+        heads.extend(segment)
+        ahead = _segment(ahead)[1]
+    cycle = len(heads)
+    for _ in range(steps):
+        segment, pointer = _segment(pointer)
+        heads.extend(segment)
+    return heads, None, cycle
+
+
+def _check_picklable(thunk):
+    func = thunk
+    while type(func) in (partial, Trampoline):
+        func = func.func
+    qualname = getattr(func, '__qualname__', '')
+    if '<lambda>' in qualname or '<locals>' in qualname:
+        raise pickle.PicklingError(
+            f"cannot pickle the pending tail {thunk!r} of a Stream, force it first "
+            f"or build it from module-level functions")
+
+
+def _unpickle_stream(heads, tail, cycle):
+    # ``heads`` is not used by anyone else, the chunk can share it
+    stream = Stream.from_heads(heads, tail)
+    if cycle is not None:
+        last = stream._last if type(stream) is ChunkedStream else stream
+        if cycle == 0:
+            last._tail = stream
+        elif cycle == len(heads) - 1:
+            last._tail = last
+        else:
+            last._tail = ChunkedStream(heads, cycle, last)
+    return stream
+
+
+def _iterate(y):
+    while y is not None:
+        if type(y) is ChunkedStream:
+            yield from y.chunk
+            y = y.rest
+            continue
+        yield y.head
+        y = y.tail
+
+
+async def _aiterate(y):
+    while y is not None:
+        yield y.head
+        y = await y.tail
+
+
+def _same_node(x, y):
+    """identity, except that views at the same position of the same chunk are the same node"""
+    return x is y or (type(x) is ChunkedStream and type(y) is ChunkedStream
+                      and x._last is y._last and x._index == y._index)
+
+
+class StreamIndex(typing.Generic[_ST]):
+    """Growable array of the nodes of a stream, for random access into its forced prefix.
+
+    Indexing a node that was already reached costs O(1); indexing further only walks
+    from the furthest node reached so far."""
+    __slots__ = ('_nodes', '_lock')
+
+    def __init__(self, stream: 'typing.Union[Stream[_ST], None]'):
+        self._nodes = [] if stream is None else [stream]
+        self._lock = threading.Lock()
+
+    def node(self, item: int) -> Stream[_ST]:
+        nodes = self._nodes
+        if item < 0:
+            item += len(self)
+            if item < 0:
+                raise IndexError("stream index out of range")
+        if item >= len(nodes):
+            with self._lock:
+                while item >= len(nodes):
+                    tail = nodes[-1].tail if nodes else None
+                    if tail is None:
+                        raise IndexError("stream index out of range")
+                    nodes.append(tail)
+        return nodes[item]
+
+    def __len__(self):
+        """forces the whole stream, which must be finite"""
+        nodes = self._nodes
+        with self._lock:
+            while nodes:
+                tail = nodes[-1].tail
+                if tail is None:
+                    break
+                nodes.append(tail)
+        return len(nodes)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            if item.step == 0:
+                raise ValueError("slice step cannot be zero")
+            if any(i is not None and i < 0 for i in (item.start, item.stop, item.step)):
+                len(self)
+                return Stream.from_heads(tuple(node.head for node in self._nodes[item]))
+            start = item.start or 0
+            try:
+                node = self.node(start)
+            except IndexError:
+                return None
+            if item.stop is None:
+                return node[::item.step]
+            return node[:max(item.stop - start, 0):item.step]
+        return self.node(item).head
+
+    def __reduce__(self):
+        return StreamIndex, (self._nodes[0] if self._nodes else None,)
+
+
+class _AsyncDelayed:
+    """Pending tail of an `AsyncStream`, forced at most once even if several tasks await it."""
+    __slots__ = ('_func', '_task')
+
+    def __init__(self, func):
+        self._func = func
+        self._task = None
+
+    async def _run(self):
+        import inspect  # not at module level: synchronous users should not pay for it, nor for asyncio
+        value = self._func()
+        if inspect.isawaitable(value):
+            value = await value
+        if not (value is None or isinstance(value, AsyncStream)):
+            value = AsyncStream(value)
+        return value
+
+    async def force(self):
+        import asyncio
+        task = self._task
+        if task is None:
+            task = self._task = asyncio.ensure_future(self._run())
+        try:
+            # shielded, so that one cancelled awaiter does not cancel it for the others
+            return await asyncio.shield(task)
+        except BaseException:
+            if task.done() and self._task is task:
+                self._task = None  # let the next await retry, as `Stream.tail` does
+            raise
+
+    def __repr__(self):
+        return repr(self._func)
+
+
+class AsyncStream(typing.Generic[_ST]):
+    """`Stream` whose tail is awaited: ``await s.tail``, ``async for x in s``.
+
+    A tail can be given as a callable returning an `AsyncStream`, ``None`` or an awaitable of them,
+    such as a coroutine function."""
+    __slots__ = ('_head', '_tail')
+
+    def __init__(self, head, *args):
+        if args:
+            *more_heads, tail = args
+        else:
+            more_heads = tail = None
+        self._head = head
+        if more_heads:
+            tail = partial(AsyncStream, *more_heads, tail)
+        if callable(tail):
+            tail = _AsyncDelayed(tail)
+        elif not (tail is None or isinstance(tail, AsyncStream)):
+            tail = AsyncStream(tail)
+        self._tail = tail
+
+    @property
+    def head(self) -> _ST:
+        return self._head
+
+    @property
+    def tail(self) -> 'typing.Awaitable[typing.Optional[AsyncStream[_ST]]]':
+        return self._force_tail()
+
+    async def _force_tail(self):
+        tail = self._tail
+        if type(tail) is _AsyncDelayed:
+            tail = self._tail = await tail.force()
+        return tail
+
+    def __aiter__(self) -> typing.AsyncIterator[_ST]:
+        # as `Stream.__iter__`, the generator only refers to the node it is at
+        return _aiterate(self)
+
+    __repr__ = Stream.__repr__
+
+    @classmethod
+    async def from_async_iterable(
+            cls, aiterable: typing.AsyncIterable[_ST]
+    ) -> 'typing.Optional[AsyncStream[_ST]]':
+        """should consume the async iterable"""
+        it = aiterable.__aiter__()
+        try:
+            n = await it.__anext__()
+        except StopAsyncIteration:
+            return None
+        else:
+            return cls(n, partial(cls.from_async_iterable, it))
@@ -1,5 +1,9 @@
 """Well-known streams"""
+import itertools
+import operator
+from functools import partial
 
+import more_streamtools
 import streamtools
 from sicp_streams import Stream
 
@@ -35,6 +39,37 @@ def _prime2p(n):
 
 primes2 = Stream(2, lambda: streamtools.sfilter(_prime2p, streamtools.count(3)))
 
+# numbers with no prime factor other than 2, 3 and 5, SICP exercise 3.56
+hamming = Stream(1, lambda: more_streamtools.union(
+    *(streamtools.smap(partial(operator.mul, n), hamming) for n in (2, 3, 5))))
+
+
+def _prime_segments(size):
+    """tuples of the primes in [0, size), [size, 2 * size), ..., by a segmented sieve of Eratosthenes"""
+    sieve = bytearray([1]) * size
+    sieve[:2] = b'\0\0'
+    for n in range(2, int(size ** 0.5) + 1):
+        if sieve[n]:
+            sieve[n * n::n] = bytes(len(range(n * n, size, n)))
+    yield tuple(itertools.compress(range(size), sieve))
+    low = size
+    while True:
+        high = low + size
+        sieve = bytearray([1]) * size
+        # every prime below sqrt(high) is already in the forced prefix
+        for p in itertools.takewhile(lambda p: p * p < high, segmented_primes):
+            start = max(p * p, -(-low // p) * p) - low
+            sieve[start::p] = bytes(len(range(start, size, p)))
+        yield tuple(itertools.compress(range(low, high), sieve))
+        low = high
+
+
+def _from_chunks(chunks):
+    return Stream.from_heads(next(chunks), partial(_from_chunks, chunks))
+
+
+segmented_primes = _from_chunks(_prime_segments(1 << 16))
+
 
 @Stream.from_generator_function
 def pi_summands(x):
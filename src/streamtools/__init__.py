@@ -1,19 +1,27 @@
 """analog to itertools from standard library"""
+import itertools
 import operator
 from functools import partial
 
-from sicp_streams import Stream
+from sicp_streams import Stream, ChunkedStream, Trampoline
 
 
 def smap(func, *streams):
-    def resolve():
-        tails = [s.tail for s in streams]
-        if not all(tails):
-            return None
-        else:
-            return smap(func, *tails)
+    if len(streams) == 1 and type(streams[0]) is ChunkedStream:
+        stream, = streams
+        # the tail of the chunk's last node is the rest of the stream
+        return Stream.from_heads(tuple(map(func, stream.chunk)), Trampoline(_smap_tail, func, (stream._last,)))
 
-    return Stream(func(*(s.head for s in streams)), resolve)
+    return Stream(func(*(s.head for s in streams)), Trampoline(_smap_tail, func, streams))
+
+
+def _smap_tail(func, streams):
+    tails = []
+    for s in streams:
+        tails.append((yield s))
+    if not all(tails):
+        return None
+    return smap(func, *tails)
 
 
 def szip(*streams):
@@ -27,11 +35,26 @@ def szip(*streams):
 
 
 def sfilter(func, stream):
-    while stream is not None and not func(stream.head):
-        stream = stream.tail
-    if stream is None:
-        return None
-    return Stream(stream.head, lambda: sfilter(func, stream.tail))
+    return Trampoline(_sfilter_from, func, stream)()
+
+
+def _sfilter_from(func, stream):
+    while stream is not None:
+        if type(stream) is ChunkedStream:
+            heads = tuple(filter(func, stream.chunk))
+            if heads:
+                return Stream.from_heads(heads, Trampoline(_sfilter_tail, func, stream._last))
+            stream = yield stream._last
+        elif func(stream.head):
+            return Stream(stream.head, Trampoline(_sfilter_tail, func, stream))
+        else:
+            stream = yield stream
+    return None
+
+
+def _sfilter_tail(func, stream):
+    stream = yield stream
+    return (yield from _sfilter_from(func, stream))
 
 
 def count(start=0, step=1):
@@ -58,7 +81,9 @@ def cycle(stream):
 
 def repeat(obj, times=None):
     if times is None:
-        return cycle(Stream(obj, None))
+        s = Stream(obj, lambda: s)
+        s.tail  # closes the loop now, no thunk is left (and it can be pickled)
+        return s
     if times <= 0:
         return None
     return Stream(obj, partial(repeat, obj, times - 1))
@@ -82,23 +107,43 @@ def accumulate(stream, func=operator.add, *, initial=None):
 
 
 def chain(*streams):
-    if not streams:
+    return _chain(Stream.from_heads(streams))
+
+
+def _chain(streams):
+    # the streams left are a cons list, so moving on to the next one costs O(1) however many there are
+    while streams is not None and streams.head is None:
+        streams = streams.tail
+    if streams is None:
         return None
-    first, *streams = streams
-    if first is None:
-        return chain(*streams)
-    if not streams:
+    return _chain_from(streams.head, streams.tail)
+
+
+def _chain_from(first, rest):
+    while rest is not None and rest.head is None:
+        rest = rest.tail
+    if rest is None:
         return first
-    return Stream(first.head, partial(chain, first.tail, *streams))
+    if type(first) is ChunkedStream:
+        return Stream.from_heads(first.chunk, Trampoline(_chain_tail, first._last, rest))
+    return Stream(first.head, Trampoline(_chain_tail, first, rest))
+
+
+def _chain_next(first, rest):
+    return _chain(rest) if first is None else _chain_from(first, rest)
+
+
+def _chain_tail(first, rest):
+    first = yield first
+    return _chain_next(first, rest)
 
 
 def chain_from_streams(streams):
+    while streams is not None and streams.head is None:
+        streams = streams.tail
     if streams is None:
         return None
     first = streams.head
-    # streams = streams.tail
-    if first is None:
-        return chain_from_streams(streams.tail)
     # if streams.tail is None:
     #     return first
     return Stream(first.head, lambda: chain_from_streams(Stream(first.tail, streams.tail)))
@@ -109,7 +154,16 @@ def compress(data, selectors):
         data, selectors = data.tail, selectors.tail
     if data is None or selectors is None:
         return None
-    return Stream(data.head, lambda: compress(data.tail, selectors.tail))
+    return Stream(data.head, Trampoline(_compress_tail, data, selectors))
+
+
+def _compress_tail(data, selectors):
+    data = yield data
+    selectors = yield selectors
+    while data and selectors and not selectors.head:
+        data = yield data
+        selectors = yield selectors
+    return compress(data, selectors)
 
 
 def dropwhile(predicate, stream):
@@ -123,7 +177,16 @@ def filterfalse(func, stream):
         stream = stream.tail
     if stream is None:
         return None
-    return Stream(stream.head, lambda: filterfalse(func, stream.tail))
+    return Stream(stream.head, Trampoline(_filterfalse_tail, func, stream))
+
+
+def _filterfalse_tail(func, stream):
+    stream = yield stream
+    while stream is not None and func(stream.head):
+        stream = yield stream
+    if stream is None:
+        return None
+    return Stream(stream.head, Trampoline(_filterfalse_tail, func, stream))
 
 
 def groupby(stream, key=None):
@@ -150,16 +213,41 @@ def groupby(stream, key=None):
 def sslice(stream, *args):
     s = slice(*args)
     start, stop, step = s.start or 0, s.stop or float('+inf'), s.step or 1
+    return Trampoline(_sslice_from, stream, start, stop, step)()
+
 
+def _sslice_from(stream, start, stop, step):
+    # ``start`` and ``stop`` count from ``stream``
     if stop <= start:
         return None
-    while stream is not None and start > 0:
-        stream = stream.tail
-        start -= 1
-        stop -= 1
-    if stream is None:
+    while stream is not None:
+        if type(stream) is ChunkedStream:
+            chunk = stream.chunk
+            n = len(chunk)
+            if start < n:
+                heads = chunk[start:min(stop, n):step]
+                start += len(heads) * step
+                if start >= stop:
+                    return Stream.from_heads(heads)
+                return Stream.from_heads(heads, Trampoline(_sslice_tail, stream._last, start - n, stop - n, step))
+            stream = yield stream._last
+            start -= n
+            stop -= n
+        elif start > 0:
+            stream = yield stream
+            start -= 1
+            stop -= 1
+        else:
+            return Stream(stream.head, Trampoline(_sslice_tail, stream, step - 1, stop - 1, step))
+    return None
+
+
+def _sslice_tail(stream, start, stop, step):
+    # ``start`` and ``stop`` count from the tail of ``stream``; never force past ``stop``
+    if stop <= start:
         return None
-    return Stream(stream.head, lambda: sslice(stream, step, stop, step))
+    stream = yield stream
+    return (yield from _sslice_from(stream, start, stop, step))
 
 
 def starmap(func, stream):
@@ -171,7 +259,11 @@ def starmap(func, stream):
 def takewhile(predicate, stream):
     if stream is None or not predicate(stream.head):
         return None
-    return Stream(stream.head, lambda: takewhile(predicate, stream.tail))
+    return Stream(stream.head, Trampoline(_takewhile_tail, predicate, stream))
+
+
+def _takewhile_tail(predicate, stream):
+    return takewhile(predicate, (yield stream))
 
 
 def tee(stream, n=2):
@@ -190,35 +282,160 @@ def zip_longest(*streams, fillvalue=None):
 
 
 def product(*streams, repeat=1):
-    streams = streams * repeat
     # product() = [[]]
-    if not streams:
+    if not streams or not repeat:
         return Stream(())
-    first, *rest = streams
-    # product(first, *rest) = first >>= \f -> product(*rest) >>= \r -> [(f, *r)]
-    return chain_from_streams(smap(lambda f: smap(lambda r: (f, *r), product(*rest)), first))
+    if any(s is None for s in streams):
+        return None
+    return Stream.from_iterable(_product(streams, len(streams) * repeat))
+
+
+def _product(streams, depth):
+    # an odometer of nodes, the last one turns fastest; factors repeat cyclically so `repeat` shares the streams
+    k = len(streams)
+    nodes = [streams[i % k] for i in range(depth)]
+    while True:
+        yield tuple(node.head for node in nodes)
+        for i in reversed(range(depth)):
+            node = nodes[i].tail
+            if node is not None:
+                nodes[i] = node
+                break
+            nodes[i] = streams[i % k]
+        else:
+            return
 
 
 def permutations(stream, r=None):
     pool = tuple(stream)
     n = len(pool)
     r = n if r is None else r
-    return smap(lambda indices: tuple(pool[i] for i in indices),
-                sfilter(lambda indices: len(set(indices)) == r,
-                        product(Stream(*range(n)), repeat=r)))
+    return Stream.from_iterable(_permutations(pool, n, r))
+
+
+def _permutations(pool, n, r):
+    # steps the index cycles in place like itertools.permutations, lexicographic without a filter
+    if r > n:
+        return
+    indices = list(range(n))
+    cycles = list(range(n, n - r, -1))
+    yield tuple(pool[i] for i in indices[:r])
+    while True:
+        for i in reversed(range(r)):
+            cycles[i] -= 1
+            if cycles[i] == 0:
+                indices[i:] = indices[i + 1:] + indices[i:i + 1]
+                cycles[i] = n - i
+            else:
+                j = cycles[i]
+                indices[i], indices[-j] = indices[-j], indices[i]
+                yield tuple(pool[i] for i in indices[:r])
+                break
+        else:
+            return
 
 
 def combinations(stream, r):
     pool = tuple(stream)
+    return Stream.from_iterable(_combinations(pool, r))
+
+
+def _combinations(pool, r):
     n = len(pool)
-    return smap(lambda indices: tuple(pool[i] for i in indices),
-                sfilter(lambda indices: sorted(indices) == list(indices),
-                        permutations(Stream(*range(n)), r)))
+    if r > n:
+        return
+    indices = list(range(r))
+    yield tuple(pool[i] for i in indices)
+    while True:
+        # the rightmost index that can still move right
+        for i in reversed(range(r)):
+            if indices[i] != i + n - r:
+                break
+        else:
+            return
+        indices[i] += 1
+        for j in range(i + 1, r):
+            indices[j] = indices[j - 1] + 1
+        yield tuple(pool[i] for i in indices)
 
 
 def combinations_with_replacement(stream, r):
     pool = tuple(stream)
+    return Stream.from_iterable(_combinations_with_replacement(pool, r))
+
+
+def _combinations_with_replacement(pool, r):
     n = len(pool)
-    return smap(lambda indices: tuple(pool[i] for i in indices),
-                sfilter(lambda indices: sorted(indices) == list(indices),
-                        product(Stream(*range(n)), repeat=r)))
+    if not n and r:
+        return
+    indices = [0] * r
+    yield tuple(pool[i] for i in indices)
+    while True:
+        for i in reversed(range(r)):
+            if indices[i] != n - 1:
+                break
+        else:
+            return
+        indices[i:] = [indices[i] + 1] * (r - i)
+        yield tuple(pool[i] for i in indices)
+
+
+class Pipeline:
+    """Records `smap`, `sfilter`, `starmap`, `takewhile`, `sslice` and `accumulate` stages over a stream.
+
+    `Pipeline.stream` walks the source once through all stages fused together,
+    so only the resulting stream is built, no intermediate ones. Each stage returns a new pipeline."""
+    __slots__ = ('_source', '_stages')
+
+    def __init__(self, stream, stages=()):
+        self._source = stream
+        self._stages = stages
+
+    def _then(self, name, stage, *args):
+        return Pipeline(self._source, self._stages + ((name, stage, args),))
+
+    @property
+    def source(self):
+        return self._source
+
+    @property
+    def stages(self):
+        """``(name, args)`` of each stage in order, ``name`` being the method that recorded it"""
+        return tuple((name, args) for name, _, args in self._stages)
+
+    def smap(self, func):
+        return self._then('smap', map, func)
+
+    def sfilter(self, func):
+        return self._then('sfilter', filter, func)
+
+    def starmap(self, func):
+        return self._then('starmap', itertools.starmap, func)
+
+    def takewhile(self, predicate):
+        return self._then('takewhile', itertools.takewhile, predicate)
+
+    def sslice(self, *args):
+        return self._then('sslice', _islice, *args)
+
+    def accumulate(self, func=operator.add):
+        return self._then('accumulate', _accumulate, func)
+
+    def apply(self, iterable):
+        """iterator over the elements of ``iterable`` through all stages, the source left aside"""
+        it = iter(iterable)
+        for _, stage, args in self._stages:
+            it = stage(*args, it)
+        return it
+
+    def stream(self, chunk_size=1):
+        return Stream.from_iterable(self.apply(() if self._source is None else self._source), chunk_size)
+
+
+def _islice(*args):
+    *args, it = args
+    return itertools.islice(it, *args)
+
+
+def _accumulate(func, it):
+    return itertools.accumulate(it, func)
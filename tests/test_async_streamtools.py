@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+import async_streamtools
+from sicp_streams import AsyncStream
+
+
+def _run(coroutine):
+    return asyncio.run(coroutine)
+
+
+async def _list(s):
+    if s is None:
+        return []
+    return [x async for x in s]
+
+
+async def _err1():
+    async def fails():
+        return AsyncStream(1 / 0)
+
+    return AsyncStream(1, fails)
+
+
+def test_smap():
+    async def main():
+        async def add(x, y):
+            await asyncio.sleep(0)
+            return x + y
+
+        assert await _list(await async_streamtools.smap(add, AsyncStream(1, 2, 3), AsyncStream(4, 5, 6))) == [5, 7, 9]
+        assert await _list(await async_streamtools.smap(lambda x: x * 2, AsyncStream(1, 2))) == [2, 4]
+        mapped = await async_streamtools.smap(lambda x: x, await _err1())
+        assert mapped.head == 1
+        with pytest.raises(ZeroDivisionError):
+            await mapped.tail
+
+    _run(main())
+
+
+def test_szip():
+    async def main():
+        zipped = await async_streamtools.szip(AsyncStream(1, 2, 3), AsyncStream(4, 5))
+        assert await _list(zipped) == [(1, 4), (2, 5)]
+
+    _run(main())
+
+
+def test_sfilter():
+    async def main():
+        async def even(x):
+            return x % 2 == 0
+
+        assert await _list(await async_streamtools.sfilter(even, AsyncStream(*range(10)))) == [0, 2, 4, 6, 8]
+        assert await async_streamtools.sfilter(lambda x: x > 10, AsyncStream(*range(10))) is None
+
+    _run(main())
+
+
+def test_chain():
+    async def main():
+        assert await async_streamtools.chain() is None
+        s4t6 = AsyncStream(4, 5, 6)
+        chained = await async_streamtools.chain(AsyncStream(1, 2, 3), None, s4t6)
+        assert await _list(chained) == [1, 2, 3, 4, 5, 6]
+        assert await (await (await chained.tail).tail).tail is s4t6
+
+    _run(main())
+
+
+def test_sslice():
+    async def main():
+        s = AsyncStream(*"ABCDEFG")
+        assert await _list(await async_streamtools.sslice(s, 2)) == [*"AB"]
+        assert await _list(await async_streamtools.sslice(s, 2, 4)) == [*"CD"]
+        assert await _list(await async_streamtools.sslice(s, 1, None, 2)) == [*"BDF"]
+        assert await async_streamtools.sslice(s, 10, None) is None
+
+    _run(main())
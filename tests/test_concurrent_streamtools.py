@@ -0,0 +1,166 @@
+import concurrent.futures
+import gc
+import operator
+import threading
+import time
+
+import pytest
+
+import concurrent_streamtools
+import streamtools
+from sicp_streams import Stream
+
+
+def _slow_square(x):
+    time.sleep(0.05 * (x % 3))
+    return x * x
+
+
+def test_parallel_smap():
+    with concurrent.futures.ThreadPoolExecutor(8) as executor:
+        s = concurrent_streamtools.parallel_smap(_slow_square, Stream(*range(20)), executor, prefetch=8)
+        assert s == Stream(*(x * x for x in range(20)))
+    assert concurrent_streamtools.parallel_smap(_slow_square, None) is None
+    assert concurrent_streamtools.parallel_smap(operator.neg, streamtools.count())[100] == -100
+
+
+def test_parallel_smap_reads_ahead():
+    def slow(x):
+        time.sleep(0.1)
+        return x
+
+    with concurrent.futures.ThreadPoolExecutor(8) as executor:
+        start = time.perf_counter()
+        assert list(concurrent_streamtools.parallel_smap(slow, Stream(*range(8)), executor, prefetch=8)) == \
+               list(range(8))
+        assert time.perf_counter() - start < 0.5
+
+
+def test_parallel_smap_error():
+    def check(x):
+        if x == 3:
+            raise ValueError
+        return x
+
+    with concurrent.futures.ThreadPoolExecutor(4) as executor:
+        s = concurrent_streamtools.parallel_smap(check, Stream(*range(6)), executor)
+        assert s[2] == 2
+        with pytest.raises(ValueError):
+            # noinspection PyStatementEffect
+            # should raise
+            s[3]
+        with pytest.raises(ValueError):
+            # noinspection PyStatementEffect
+            # should raise
+            s[3]
+
+
+def test_parallel_smap_processes():
+    with concurrent.futures.ProcessPoolExecutor(2) as executor:
+        assert concurrent_streamtools.parallel_smap(operator.neg, Stream(*range(10)), executor) == \
+               Stream(*range(0, -10, -1))
+
+
+def test_parallel_smap_unordered():
+    with concurrent.futures.ThreadPoolExecutor(8) as executor:
+        s = concurrent_streamtools.parallel_smap_unordered(_slow_square, Stream(*range(20)), executor, prefetch=8)
+        assert sorted(s) == [x * x for x in range(20)]
+        assert list(s) == list(s)
+
+
+def test_prefetch():
+    assert concurrent_streamtools.prefetch(range(1000), depth=16) == Stream.from_iterable(range(1000))
+    assert concurrent_streamtools.prefetch(range(1000), chunk_size=100) == Stream.from_iterable(range(1000))
+    assert concurrent_streamtools.prefetch([]) is None
+
+
+def test_prefetch_reads_ahead():
+    def slow():
+        for i in range(5):
+            time.sleep(0.05)
+            yield i
+
+    s = concurrent_streamtools.prefetch(slow(), depth=8)
+    time.sleep(0.4)
+    start = time.perf_counter()
+    assert list(s) == list(range(5))
+    assert time.perf_counter() - start < 0.05
+
+
+def test_prefetch_policies():
+    def source(produced):
+        for i in range(100):
+            produced.append(i)
+            yield i
+
+    produced = []
+    s = concurrent_streamtools.prefetch(source(produced), depth=4)
+    time.sleep(0.1)
+    assert len(produced) <= 6  # the buffer, the one being put, and the one taken first
+    assert list(s) == list(range(100))
+
+    # the first element may be taken before the buffer fills up
+    s = concurrent_streamtools.prefetch(source([]), depth=4, policy='drop_newest')
+    time.sleep(0.1)
+    assert list(s) in ([0, 1, 2, 3], [0, 1, 2, 3, 4])
+
+    s = concurrent_streamtools.prefetch(source([]), depth=4, policy='drop_oldest')
+    time.sleep(0.1)
+    assert list(s) in ([96, 97, 98, 99], [0, 96, 97, 98, 99])
+
+    with pytest.raises(ValueError):
+        concurrent_streamtools.prefetch([], policy='unknown')
+
+
+def test_prefetch_error():
+    def fails():
+        yield 1
+        raise ZeroDivisionError
+
+    s = concurrent_streamtools.prefetch(fails())
+    assert s.head == 1
+    with pytest.raises(ZeroDivisionError):
+        # noinspection PyStatementEffect
+        # should raise
+        s.tail
+    with pytest.raises(ZeroDivisionError):
+        # noinspection PyStatementEffect
+        # should raise
+        s.tail
+
+
+def test_prefetch_stops_when_collected():
+    closed = threading.Event()
+
+    def endless():
+        try:
+            yield from streamtools.count()
+        finally:
+            closed.set()
+
+    s = concurrent_streamtools.prefetch(endless(), depth=4)
+    assert s[10] == 10
+    del s
+    gc.collect()
+    assert closed.wait(1)
+
+
+def _triple(x):
+    return x * 3
+
+
+def test_parallel_pipeline():
+    s = Stream.from_iterable(range(-500, 500))
+    pipeline = streamtools.Pipeline(s).smap(_triple).sfilter(operator.truth)
+    with concurrent.futures.ProcessPoolExecutor(2) as executor:
+        for p in (pipeline, pipeline.accumulate(), pipeline.accumulate(max)):
+            assert list(concurrent_streamtools.parallel_pipeline(p, executor, chunk_size=7)) == list(p.stream())
+        pairs = streamtools.Pipeline(streamtools.szip(s, s)).starmap(operator.mul)
+        assert concurrent_streamtools.parallel_pipeline(pairs, executor, prefetch=1)[999] == 499 * 499
+        only_zero = streamtools.Pipeline(s).sfilter(operator.not_)
+        assert concurrent_streamtools.parallel_pipeline(only_zero, executor, chunk_size=10) == Stream(0)
+        assert concurrent_streamtools.parallel_pipeline(streamtools.Pipeline(None).smap(abs), executor) is None
+    with pytest.raises(ValueError):
+        concurrent_streamtools.parallel_pipeline(pipeline.takewhile(operator.truth))
+    with pytest.raises(ValueError):
+        concurrent_streamtools.parallel_pipeline(pipeline.accumulate().smap(abs))
@@ -0,0 +1,83 @@
+"""Single-pass consumption must not keep the consumed prefix alive.
+
+Set ``STREAMS_MEMORY_N=10000000`` to run it on 10⁷ elements, it takes a few minutes under tracemalloc."""
+import asyncio
+import gc
+import os
+import tracemalloc
+
+import more_streamtools
+import streamtools
+from sicp_streams import AsyncStream, Stream
+
+N = int(os.environ.get('STREAMS_MEMORY_N', 10 ** 6))
+CHUNK_SIZE = 1000
+CEILING = 2 * 1024 * 1024  # bytes, a few chunks, far below the ~36 bytes per element of a kept prefix
+
+
+def _peak(func):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def _source(n=N):
+    return Stream.from_iterable(range(n), chunk_size=CHUNK_SIZE)
+
+
+def test_iter():
+    def consume():
+        for _ in _source():
+            pass
+
+    assert _peak(consume) < CEILING
+
+
+def test_sum():
+    # a builtin's caller keeps its arguments alive until it returns, so hand it an iterator
+    assert _peak(lambda: sum(iter(_source()))) < CEILING
+
+
+def test_quantify():
+    assert _peak(lambda: more_streamtools.quantify(_source())) < CEILING
+
+
+def test_dotproduct():
+    assert _peak(lambda: more_streamtools.dotproduct(_source(), _source())) < CEILING
+
+
+def test_tail():
+    assert _peak(lambda: more_streamtools.tail(3, _source(N // 10))) < CEILING
+
+
+def test_smap_sfilter():
+    def consume():
+        for _ in streamtools.sfilter(lambda x: x % 3, streamtools.smap(lambda x: x + 1, _source())):
+            pass
+
+    assert _peak(consume) < CEILING
+
+
+def test_element_wise():
+    def consume():
+        for _ in streamtools.takewhile(lambda x: x < N // 100, streamtools.count()):
+            pass
+
+    assert _peak(consume) < CEILING
+
+
+def test_async_iter():
+    async def agen():
+        for i in range(N // 20):
+            yield i
+
+    async def consume():
+        async for _ in await AsyncStream.from_async_iterable(agen()):
+            pass
+
+    assert _peak(lambda: asyncio.run(consume())) < CEILING
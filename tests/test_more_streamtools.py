@@ -9,6 +9,16 @@ def test_prepend():
     assert prepend("value", Stream(*range(5))) == Stream("value", 0, 1, 2, 3, 4)
 
 
+def test_append():
+    assert append(Stream(*range(3)), 3, 4) == Stream(*range(5))
+    assert append(None, 1) == Stream(1)
+
+
+def test_reverse():
+    assert reverse(Stream(*range(5))) == Stream(4, 3, 2, 1, 0)
+    assert reverse(None) is None
+
+
 def test_tabulate():
     assert tabulate(lambda x: x ** 2)[3] == 9
     assert tabulate(lambda x: x, 5)[0] == 5
@@ -17,6 +27,7 @@ def test_tabulate():
 def test_tail():
     assert tail(3, Stream(*"ABCDEFG")) == Stream(*"EFG")
     assert tail(0, Stream(*"ABCDEFG")) is None
+    assert tail(10, Stream(*"ABC")) == Stream(*"ABC")
 
 
 def test_all_equal():
@@ -45,6 +56,12 @@ def test_dotproduct():
 def test_convolve():
     assert convolve(Stream(1, 2, 3, 4, 5), [0.25] * 4) == Stream(0.25, 0.75, 1.5, 2.5, 3.5, 3, 2.25, 1.25)
     assert convolve(Stream(1, 2, 3, 4, 5), [1, -1]) == Stream(1, 1, 1, 1, 1, -5)
+    assert convolve(None, [1, 2, 3]) == Stream(0, 0)
+
+
+def test_fir_filter():
+    assert fir_filter(Stream(1, 2, 3, 4, 5), [0.25] * 4) == Stream(0.25, 0.75, 1.5, 2.5, 3.5)
+    assert fir_filter(count(), [1, -1])[1000] == 1
 
 
 def test_flatten():
@@ -58,11 +75,27 @@ def test_repeatfunc():
 
 def test_pairwise():
     assert pairwise(None) is None
+    assert pairwise(Stream(1)) is None
     assert pairwise(Stream(1, 2, 3)) == Stream((1, 2), (2, 3))
+    assert pairwise(Stream(1, 2, 3, 4), 3) == Stream((1, 2, 3), (2, 3, 4))
+
+
+def test_sliding_window():
+    assert sliding_window(Stream(*"ABCDE"), 3) == Stream(("A", "B", "C"), ("B", "C", "D"), ("C", "D", "E"))
+    assert sliding_window(Stream(*"AB"), 3) is None
+    assert sliding_window(count(), 4)[1000] == (1000, 1001, 1002, 1003)
+
+
+def test_batched():
+    assert batched(Stream(*"ABCDEFG"), 3) == Stream(("A", "B", "C"), ("D", "E", "F"), ("G",))
+    assert batched(Stream(*"ABCDEF"), 3) == Stream(("A", "B", "C"), ("D", "E", "F"))
+    assert batched(None, 3) is None
 
 
 def test_grouper():
     assert grouper(Stream(*"ABCDEFG"), 3, "x") == Stream([*"ABC"], [*"DEF"], [*"Gxx"])
+    assert grouper(Stream(*"ABCDEF"), 3) == Stream([*"ABC"], [*"DEF"])
+    assert grouper(None, 3) is None
 
 
 def test_roundrobin():
@@ -97,3 +130,20 @@ def test_first_true():
     assert first_true(Stream(0, [], ())) is False
     assert first_true(Stream(1, 5), 9, lambda x: x > 3) == 5
     assert first_true(Stream(1, 5), 9, lambda x: x > 7) == 9
+
+
+def test_merge():
+    assert merge(Stream(1, 4, 7), Stream(2, 5), None, Stream(0, 9)) == Stream(0, 1, 2, 4, 5, 7, 9)
+    assert merge(Stream("a", "bb", "ccc"), Stream("dd"), key=len) == Stream("a", "bb", "dd", "ccc")
+    assert merge() is None
+    assert merge(count(0, 2), count(1, 2))[1000] == 1000
+
+
+def test_sorted_set_operations():
+    assert dedupe_sorted(Stream(1, 1, 2, 3, 3)) == Stream(1, 2, 3)
+    assert union(Stream(1, 2, 2, 3), Stream(2, 3, 4)) == Stream(1, 2, 3, 4)
+    assert intersection(Stream(1, 2, 2, 3, 5), Stream(2, 3, 4, 5), Stream(0, 2, 5)) == Stream(2, 5)
+    assert intersection(count(0, 2), count(0, 3))[3] == 18
+    assert difference(Stream(1, 2, 2, 3, 5, 6), Stream(2, 4), Stream(5)) == Stream(1, 3, 6)
+    assert difference(count(), count(0, 2))[2] == 5
+    assert difference(None, Stream(1)) is None
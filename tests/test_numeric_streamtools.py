@@ -0,0 +1,84 @@
+import operator
+
+import pytest
+
+import more_streamtools
+import numeric_streamtools
+import streamtools
+from sicp_streams import Stream, ChunkedStream
+
+
+def test_from_iterable():
+    s = numeric_streamtools.from_iterable(range(10), block_size=4)
+    assert type(s) is ChunkedStream
+    assert s == Stream(*map(float, range(10)))
+    assert numeric_streamtools.from_iterable([]) is None
+    assert numeric_streamtools.from_iterable(range(3), 'q') == Stream(0, 1, 2)
+
+
+def test_smap():
+    s = numeric_streamtools.from_iterable(range(10), block_size=4)
+    assert numeric_streamtools.smap(lambda x: x * 2, s) == Stream(*range(0, 20, 2))
+    assert numeric_streamtools.smap(lambda x: x * 2, s, vectorized=True) == Stream(*range(0, 20, 2))
+    assert numeric_streamtools.smap(lambda x: x + 1, Stream(1, 2, 3)) == Stream(2, 3, 4)
+    assert streamtools.smap(lambda x: x + 1, numeric_streamtools.smap(abs, s)) == Stream(*range(1, 11))
+
+
+def test_accumulate():
+    s = numeric_streamtools.from_iterable(range(1, 11), block_size=3)
+    assert numeric_streamtools.accumulate(s) == streamtools.accumulate(Stream(*range(1, 11)))
+    assert numeric_streamtools.accumulate(s, operator.mul) == streamtools.accumulate(Stream(*range(1, 11)),
+                                                                                    operator.mul)
+    assert numeric_streamtools.accumulate(s, initial=100) == Stream(100, 101, 103, 106, 110, 115, 121, 128,
+                                                                     136, 145, 155)
+    assert numeric_streamtools.accumulate(s, max) == Stream(*range(1, 11))
+    assert numeric_streamtools.accumulate(None) is None
+    summands = [(-1) ** i / (2 * i + 1) for i in range(50)]
+    assert numeric_streamtools.accumulate(Stream.from_iterable(summands, chunk_size=7)) == \
+           streamtools.accumulate(Stream.from_iterable(summands))
+    if numeric_streamtools.numpy is not None:
+        # every block is an ndarray, not only the first one
+        s = numeric_streamtools.accumulate(numeric_streamtools.from_iterable(range(5)), lambda x, y: x + y)
+        assert all(isinstance(x, numeric_streamtools.numpy.float64) for x in s)
+        assert s == Stream(0, 1, 3, 6, 10)
+
+
+def test_dotproduct():
+    assert numeric_streamtools.dotproduct(Stream(1, 2, 3), Stream(4, 5, 6)) == 32
+    assert numeric_streamtools.dotproduct(numeric_streamtools.from_iterable(range(100), block_size=7),
+                                          numeric_streamtools.from_iterable(range(50), block_size=9)) == \
+           sum(i * i for i in range(50))
+
+
+def test_convolve():
+    assert numeric_streamtools.convolve(Stream(1, 2, 3, 4, 5), [0.25] * 4) == \
+           Stream(0.25, 0.75, 1.5, 2.5, 3.5, 3, 2.25, 1.25)
+    assert numeric_streamtools.convolve(Stream(1, 2, 3, 4, 5), [1, -1]) == Stream(1, 1, 1, 1, 1, -5)
+    signal = Stream.from_iterable(range(100), chunk_size=8)
+    assert numeric_streamtools.convolve(signal, [1, 2, 3]) == more_streamtools.convolve(signal, [1, 2, 3])
+
+
+def test_diff():
+    assert numeric_streamtools.diff(Stream(1, 4, 9, 16)) == Stream(3, 5, 7)
+    assert numeric_streamtools.diff(numeric_streamtools.from_iterable([x * x for x in range(20)], block_size=3)) == \
+           Stream(*range(1, 39, 2))
+    assert numeric_streamtools.diff(Stream(1)) is None
+
+
+def test_convolve_fft():
+    signal = Stream.from_iterable([(i * 7919) % 101 - 50.0 for i in range(1000)], chunk_size=37)
+    kernel = [((i * 31) % 17) / 17 for i in range(100)]
+    direct = numeric_streamtools.convolve(signal, kernel, method='direct')
+    if numeric_streamtools.numpy is None:
+        with pytest.raises(ValueError):
+            numeric_streamtools.convolve(signal, kernel, method='fft')
+        return
+    fft = numeric_streamtools.convolve(signal, kernel, method='fft')
+    assert list(fft) == pytest.approx(list(direct))
+    assert len(list(fft)) == 1000 + 100 - 1
+    # longer than one FFT segment, so the overlap carries across segments made of many chunks
+    long_signal = Stream.from_iterable([(i * 7919) % 101 - 50.0 for i in range(5000)], chunk_size=37)
+    assert list(numeric_streamtools.convolve(long_signal, kernel, method='fft')) == \
+           pytest.approx(list(numeric_streamtools.convolve(long_signal, kernel, method='direct')))
+    assert list(numeric_streamtools.convolve(signal, kernel[:3], method='fft')) == \
+           pytest.approx(list(more_streamtools.convolve(signal, kernel[:3])))
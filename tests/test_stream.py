@@ -1,8 +1,18 @@
+import array
+import asyncio
+import concurrent.futures
+import gc
+import io
 import itertools
+import pickle
+import struct
+import sys
+import threading
+import time
 
 import pytest
 
-from sicp_streams import Stream
+from sicp_streams import AsyncStream, SpillFile, Stream, StreamIndex
 
 
 def test_new_stream():
@@ -66,10 +76,16 @@ def test_equivalence():
     assert infinite_stream1 != s
     assert Stream(0, infinite_stream1) == Stream(0, infinite_stream2)
 
-    limit = Stream._eq_detect_limit
-    assert Stream(*range(limit)) == Stream(*range(limit))
-    with pytest.raises(RecursionError):
-        assert Stream(*range(limit + 1)) != Stream(*range(limit + 1))
+    assert Stream.from_iterable(range(20000)) == Stream.from_iterable(range(20000))
+    assert Stream.from_iterable(range(20000)) != Stream.from_iterable(range(20001))
+    assert Stream.from_iterable(range(10 ** 6), chunk_size=1000) == \
+           Stream.from_iterable(range(10 ** 6), chunk_size=999)
+    assert Stream.from_iterable(range(10 ** 6), chunk_size=1000) != \
+           Stream.from_iterable([*range(10 ** 6 - 1), 0], chunk_size=999)
+    assert Stream.from_iterable(range(100), chunk_size=7) == Stream(*range(100))
+    chunked_cycle = Stream.from_heads((1, 2, 3), lambda: chunked_cycle)
+    assert chunked_cycle == Stream(1, 2, 3, 1, lambda: Stream.from_heads((2, 3), chunked_cycle))
+    assert Stream(0, infinite_stream1) != Stream(0, 1, 1, 1, 2, infinite_stream2)
 
     for a, b in itertools.combinations([
         Stream(1, 2, 3),
@@ -124,3 +140,372 @@ def test_from_generator_function():
 
     assert run(10) == Stream(*range(10))
     assert run.__name__ == 'run'
+
+
+def test_chunked():
+    s = Stream.from_iterable(range(10), chunk_size=4)
+    assert s.head == 0
+    assert s.tail.head == 1
+    assert s.tail is s.tail
+    assert list(s) == list(range(10))
+    assert [s[i] for i in range(10)] == list(range(10))
+    with pytest.raises(IndexError):
+        # noinspection PyStatementEffect
+        # should raise
+        s[10]
+    assert s == Stream(*range(10))
+    assert s.chunk == (0, 1, 2, 3)
+    assert s.tail.tail.tail.tail is s.rest
+    assert Stream.from_iterable([], chunk_size=4) is None
+    assert Stream.from_iterable([1], chunk_size=4) == Stream(1)
+
+
+def test_from_heads():
+    assert Stream.from_heads((1, 2, 3)) == Stream(1, 2, 3)
+    assert Stream.from_heads((1, 2, 3), lambda: Stream(4)) == Stream(1, 2, 3, 4)
+    assert Stream.from_heads((), lambda: Stream(4)) == Stream(4)
+    assert Stream.from_heads(()) is None
+
+
+def test_tail_forced_once_across_threads():
+    calls = []
+    barrier = threading.Barrier(8)
+
+    def thunk():
+        calls.append(None)
+        time.sleep(0.01)
+        return Stream(1)
+
+    s = Stream(0, thunk)
+
+    def force():
+        barrier.wait()
+        return s.tail
+
+    with concurrent.futures.ThreadPoolExecutor(8) as executor:
+        tails = list(executor.map(lambda _: force(), range(8)))
+    assert len(calls) == 1
+    assert all(t is tails[0] for t in tails)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7])
+def test_from_iterable_threads_stress(chunk_size):
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for _ in range(5):
+            s = Stream.from_iterable(iter(range(2000)), chunk_size=chunk_size)
+            barrier = threading.Barrier(16)
+
+            def walk():
+                barrier.wait()
+                heads = []
+                p = s
+                while p is not None:
+                    heads.append(p.head)
+                    p = p.tail
+                return heads
+
+            with concurrent.futures.ThreadPoolExecutor(16) as executor:
+                results = list(executor.map(lambda _: walk(), range(16)))
+            for heads in results:
+                assert heads == list(range(2000))
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+
+def test_getitem_slice():
+    s = Stream(*range(10))
+    assert s[2:5] == Stream(2, 3, 4)
+    assert s[:3] == Stream(0, 1, 2)
+    assert s[7:] == Stream(7, 8, 9)
+    assert s[1::3] == Stream(1, 4, 7)
+    assert s[5:2] is None
+    assert s[20:] is None
+    assert Stream.from_iterable(range(10), chunk_size=4)[3:9:2] == Stream(3, 5, 7)
+    with pytest.raises(ValueError):
+        # noinspection PyStatementEffect
+        # should raise
+        s[-1:]
+    with pytest.raises(ValueError):
+        # noinspection PyStatementEffect
+        # should raise
+        s[0:5:0]
+
+
+def test_stream_index():
+    forced = []
+
+    @Stream.from_generator_function
+    def run(x):
+        for i in range(x):
+            forced.append(i)
+            yield i
+
+    index = StreamIndex(run(100))
+    assert index[50] == 50
+    assert len(forced) == 51
+    assert index.node(50) is index.node(49).tail
+    assert index[10] == 10
+    assert len(forced) == 51
+    assert index[99] == 99
+    with pytest.raises(IndexError):
+        # noinspection PyStatementEffect
+        # should raise
+        index[100]
+    assert len(index) == 100
+    assert index[-1] == 99
+    assert index[-100] == 0
+    with pytest.raises(IndexError):
+        # noinspection PyStatementEffect
+        # should raise
+        index[-101]
+    assert index[-3:] == Stream(97, 98, 99)
+    assert index[5:2:-1] == Stream(5, 4, 3)
+    assert index[10:13] == Stream(10, 11, 12)
+    assert index[98:] == Stream(98, 99)
+    assert index[100:] is None
+    assert index[10:5] is None
+    with pytest.raises(ValueError):
+        # noinspection PyStatementEffect
+        # should raise
+        index[0:5:0]
+    with pytest.raises(IndexError):
+        # noinspection PyStatementEffect
+        # should raise
+        StreamIndex(None)[0]
+
+
+def test_hash():
+    s = Stream.from_iterable(range(10))
+    with pytest.raises(TypeError):
+        hash(s)
+    list(s)
+    literal = Stream(*range(10))
+    list(literal)
+    assert hash(s) == hash(literal)
+    chunked = Stream.from_iterable(range(10), chunk_size=4)
+    list(chunked)
+    assert hash(chunked) == hash(s)
+    assert hash(chunked.tail.tail) == hash(s.tail.tail)
+    assert {s: 'cached'}[literal] == 'cached'
+    assert hash(Stream(1)) == hash(Stream(1))
+    assert hash(Stream.from_heads((1, 2, 3))) == hash(Stream.from_heads((0, 1, 2, 3)).tail)
+    short = Stream.from_iterable(range(4), chunk_size=4)
+    list(short)
+    assert hash(short) == hash(Stream.from_heads((0, 1, 2, 3)))
+    assert Stream.memoize(key='value')(lambda s: Stream(s.head))(Stream(1)) == Stream(1)
+    cycle = Stream(1, lambda: cycle)
+    list(itertools.islice(cycle, 3))
+    with pytest.raises(TypeError):
+        hash(cycle)
+
+
+def test_file_records(tmp_path):
+    path = tmp_path / 'log'
+    lines = Stream(b'first\n', b'\n', b'third')
+    assert Stream.to_file(lines, path, buffer_size=4) == 12
+    for s in (Stream.from_mmap(path, chunk_size=2), Stream.from_file(path, buffer_size=4)):
+        assert [bytes(line) for line in s] == [b'first\n', b'\n', b'third']
+        assert all(type(line) is memoryview for line in s)
+    with open(path, 'rb') as f:
+        assert Stream.from_mmap(f, delimiter=b'ir')[0] == b'fir'
+
+    frames = Stream(b'', b'abc', b'de' * 1000)
+    Stream.to_file(frames, path, prefix='<H')
+    for s in (Stream.from_mmap(path, prefix='<H'), Stream.from_file(path, prefix='<H', buffer_size=5)):
+        assert s == frames
+
+    packed = struct.Struct('<iq')
+    Stream.to_file(Stream.from_iterable(packed.pack(i, -i) for i in range(100)), path)
+    for s in (Stream.from_mmap(path, size=packed.size), Stream.from_file(path, size=packed.size, buffer_size=7)):
+        assert [packed.unpack(record) for record in s] == [(i, -i) for i in range(100)]
+    with pytest.raises(ValueError):
+        Stream.from_mmap(path, size=7)[99]
+
+    path.write_bytes(b'')
+    assert Stream.from_mmap(path) is None
+    assert Stream.from_file(path) is None
+    assert Stream.from_mmap(b'a\nb') == Stream(b'a\n', b'b')
+    assert Stream.from_mmap(memoryview(b'a\nb')) == Stream(b'a\n', b'b')
+    assert Stream.from_mmap(array.array('B', b'a\nb')) == Stream(b'a\n', b'b')
+    assert Stream.from_mmap(array.array('H', [1, 2]), size=2) == \
+           Stream(array.array('H', [1]).tobytes(), array.array('H', [2]).tobytes())
+    assert Stream.from_mmap(io.BytesIO(b'a\nb')) == Stream(b'a\n', b'b')
+
+
+def test_spill(tmp_path):
+    spill = SpillFile(window=2, directory=tmp_path)
+    s = Stream.from_iterable(range(100), chunk_size=10, spill=spill)
+    assert list(s) == list(range(100))
+    assert (spill.writes, spill.reads) == (8, 0)  # all but the two last chunks
+    assert s[15] == 15 and s.tail.head == 1
+    assert spill.reads == 2
+    assert s == Stream.from_iterable(range(100), chunk_size=7)
+    assert StreamIndex(s)[-1] == 99
+    assert spill.writes == 10  # a chunk is written only once, however often it is read back
+    spill.close()
+    with pytest.raises(ValueError):
+        Stream.from_iterable(range(100), spill=spill)
+
+
+def _round_trip(x):
+    return pickle.loads(pickle.dumps(x))
+
+
+def test_pickle():
+    s = Stream.from_iterable(range(100000))
+    list(s)
+    assert _round_trip(s) == s  # no recursion over the nodes
+    chunked = Stream.from_iterable(range(100000), chunk_size=1000)
+    list(chunked)
+    assert _round_trip(chunked) == s
+    assert _round_trip(StreamIndex(s))[-1] == 99999
+
+    pending = Stream.from_iterable(iter(range(10)))
+    assert pending[3] == 3
+    assert list(_round_trip(pending)) == list(range(10))  # the partial of the iterator goes along
+
+    cyclic = Stream(1, 2, 3, lambda: cyclic.tail)
+    list(itertools.islice(cyclic, 10))
+    copy = _round_trip(cyclic)
+    assert list(itertools.islice(copy, 8)) == [1, 2, 3, 2, 3, 2, 3, 2]
+    assert _round_trip(copy) == cyclic
+    ones = Stream(1, lambda: ones)
+    assert ones[2] == 1
+    copy = _round_trip(ones)
+    assert copy.tail is copy
+
+    with pytest.raises(pickle.PicklingError):
+        pickle.dumps(Stream(1, lambda: None))
+
+
+def test_memoize():
+    calls = []
+
+    @Stream.memoize(maxsize=2)
+    def double(s):
+        calls.append(s)
+        return Stream.from_heads(tuple(x * 2 for x in s))
+
+    s, t, u = Stream(1, 2, 3), Stream(4), Stream(5)
+    assert double(s) is double(s)
+    assert double(s) == Stream(2, 4, 6)
+    assert double.__name__ == 'double'
+    assert double.cache_info() == (2, 1, 2, 1)
+    double(t), double(u)
+    assert double(t) is double(t)
+    double(s)
+    assert calls == [s, t, u, s]  # ``s`` was the least recently used when ``u`` came in
+    assert double.cache_info().currsize == 2
+
+    del t, calls[:]
+    gc.collect()
+    assert double.cache_info().currsize == 1  # the entry of ``t`` went away with it
+    double.cache_clear()
+    assert double.cache_info() == (0, 0, 2, 0)
+
+    @Stream.memoize
+    def repeated(s):
+        return Stream(s.head, lambda: repeated(s))
+
+    r = repeated(Stream(1))
+    assert r.tail is r
+    # forcing the tail dropped the last reference to the argument, and so the entry
+    assert repeated.cache_info() == (1, 1, 128, 0)
+
+    by_value = Stream.memoize(key='value')(lambda s, n=1: Stream(s.head * n))
+    a, b = Stream(1, 2), Stream(1, 2)
+    list(a), list(b)
+    assert by_value(a) is by_value(b)
+    assert by_value(a, n=2) is by_value(b, n=2) is not by_value(a)
+    with pytest.raises(TypeError):
+        by_value(Stream(1, lambda: None))
+    with pytest.raises(ValueError):
+        Stream.memoize(key='hash')
+
+    class Scaled:
+        def __init__(self, n):
+            self.n = n
+
+        @Stream.memoize
+        def scale(self, s):
+            return Stream(s.head * self.n)
+
+    two, three = Scaled(2), Scaled(3)
+    assert two.scale(s) is two.scale(s) == Stream(2)
+    assert three.scale(s) == Stream(3)
+    assert Scaled.scale.cache_info() == two.scale.cache_info() == (1, 2, 128, 2)
+
+
+def test_async_stream():
+    async def main():
+        s = AsyncStream(1, 2, 3)
+        assert s.head == 1
+        assert (await s.tail).head == 2
+        assert await s.tail is await s.tail
+        assert [x async for x in s] == [1, 2, 3]
+
+        async def later():
+            await asyncio.sleep(0)
+            return AsyncStream(2)
+
+        assert [x async for x in AsyncStream(1, later)] == [1, 2]
+        assert [x async for x in AsyncStream(1, lambda: None)] == [1]
+
+        async def agen(n):
+            for i in range(n):
+                await asyncio.sleep(0)
+                yield i
+
+        assert [x async for x in await AsyncStream.from_async_iterable(agen(5))] == [0, 1, 2, 3, 4]
+        assert await AsyncStream.from_async_iterable(agen(0)) is None
+
+    asyncio.run(main())
+
+
+def test_async_stream_tail_forced_once():
+    async def main():
+        calls = []
+
+        async def thunk():
+            calls.append(None)
+            await asyncio.sleep(0.01)
+            return AsyncStream(1)
+
+        s = AsyncStream(0, thunk)
+        tails = await asyncio.gather(*(s.tail for _ in range(10)))
+        assert len(calls) == 1
+        assert all(t is tails[0] for t in tails)
+
+        async def agen():
+            for i in range(200):
+                await asyncio.sleep(0)
+                yield i
+
+        async def walk(s):
+            return [x async for x in s]
+
+        s = await AsyncStream.from_async_iterable(agen())
+        for result in await asyncio.gather(*(walk(s) for _ in range(10))):
+            assert result == list(range(200))
+
+    asyncio.run(main())
+
+
+def test_async_stream_retry_after_error():
+    async def main():
+        attempts = []
+
+        async def thunk():
+            attempts.append(None)
+            if len(attempts) == 1:
+                raise ValueError
+            return AsyncStream(1)
+
+        s = AsyncStream(0, thunk)
+        with pytest.raises(ValueError):
+            await s.tail
+        assert (await s.tail).head == 1
+
+    asyncio.run(main())
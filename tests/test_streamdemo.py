@@ -44,3 +44,19 @@ def test_pi_stream():
 def test_accelerated_pi_stream():
     assert accelerated_pi_stream[0] == 4
     assert abs(accelerated_pi_stream[8] - 3.1415926) < 0.0000001
+
+
+def test_sieved_primes_deep():
+    assert primes[600] == 4421
+
+
+def test_segmented_primes():
+    assert streamtools.sslice(segmented_primes, 4) == Stream(2, 3, 5, 7)
+    assert streamtools.sslice(segmented_primes, 1000) == streamtools.sslice(primes2, 1000)
+    assert segmented_primes[50] == 233
+    assert segmented_primes[10 ** 5 - 1] == 1299709
+
+
+def test_hamming():
+    assert streamtools.sslice(hamming, 10) == Stream(1, 2, 3, 4, 5, 6, 8, 9, 10, 12)
+    assert hamming[1690] == 2125764000
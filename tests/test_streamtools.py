@@ -1,4 +1,7 @@
+import itertools
 import operator
+import pickle
+import sys
 
 import pytest
 
@@ -32,6 +35,9 @@ def test_smap():
     assert mapped == direct
     mapped_err1 = streamtools.smap(lambda x: x, _err1)
     _assert_manipulated_err1(mapped_err1)
+    chunked = Stream.from_iterable(range(10), chunk_size=3)
+    assert streamtools.smap(lambda x: x * 2, chunked) == Stream(*range(0, 20, 2))
+    assert streamtools.smap(lambda x, y: x + y, chunked, chunked) == Stream(*range(0, 20, 2))
 
 
 def test_szip():
@@ -44,6 +50,9 @@ def test_sfilter():
     assert streamtools.sfilter(lambda x: x % 2 == 0, Stream.from_iterable(range(10))) == Stream(0, 2, 4, 6, 8)
     filtered_err1 = streamtools.sfilter(lambda x: True, _err1)
     _assert_manipulated_err1(filtered_err1)
+    chunked = Stream.from_iterable(range(20), chunk_size=3)
+    assert streamtools.sfilter(lambda x: x % 7 == 6, chunked) == Stream(6, 13)
+    assert streamtools.sfilter(lambda x: x > 100, chunked) is None
 
 
 def test_count():
@@ -51,6 +60,7 @@ def test_count():
     assert s.head == 0
     assert s.tail.head == 1
     assert s.tail.tail.head == 2
+    assert pickle.loads(pickle.dumps(s))[100] == 100
 
 
 def test_cycle():
@@ -70,6 +80,8 @@ def test_repeat():
     infinite = streamtools.repeat(obj)
     assert infinite.head is obj
     assert infinite.tail is infinite
+    copy = pickle.loads(pickle.dumps(streamtools.repeat('x')))
+    assert copy.tail is copy
 
     r3 = streamtools.repeat(obj, 3)
     assert r3.head is obj
@@ -97,6 +109,9 @@ def test_chain():
     assert streamtools.chain(s1t3, s4t6).tail.tail.tail is s4t6
     _assert_manipulated_err1(streamtools.chain(_err1))
     _assert_manipulated_err1(streamtools.chain(Stream(2), _err1), 2, 1)
+    streams = [None, Stream(1), None, Stream.from_iterable(range(2, 6), chunk_size=3)] * 10000
+    assert list(streamtools.chain(*streams)) == [1, 2, 3, 4, 5] * 10000
+    assert streamtools.chain(None, s4t6, None) is s4t6
 
 
 def test_chain_from_streams():
@@ -161,6 +176,13 @@ def test_sslice():
     assert streamtools.sslice(s, 0, None, 2) == Stream(*"ACEG")
     assert streamtools.sslice(s, 1, None, 2) == Stream(*"BDF")
     assert streamtools.sslice(_err1, 1) == Stream(1)
+    chunked = Stream.from_iterable("ABCDEFG", chunk_size=3)
+    assert streamtools.sslice(chunked, 2) == Stream(*"AB")
+    assert streamtools.sslice(chunked, 2, 4) == Stream(*"CD")
+    assert streamtools.sslice(chunked, 2, None) == Stream(*"CDEFG")
+    assert streamtools.sslice(chunked, 0, None, 2) == Stream(*"ACEG")
+    assert streamtools.sslice(chunked, 1, None, 2) == Stream(*"BDF")
+    assert streamtools.sslice(chunked, 4, 6) == Stream(*"EF")
     _assert_manipulated_err1(streamtools.sslice(_err1, 2))
 
 
@@ -205,6 +227,8 @@ def test_product():
         (1, 0, 0), (1, 0, 1), (1, 1, 0), (1, 1, 1),
     )
     _assert_manipulated_err1(streamtools.product(_err1, _err1), (1, 1))
+    assert streamtools.product(streamtools.count(), Stream(*"ab"))[5] == (2, 'b')
+    assert list(streamtools.product(Stream(0, 1), repeat=12)) == list(itertools.product((0, 1), repeat=12))
 
 
 def test_permutations():
@@ -269,3 +293,44 @@ def test_combinations_with_replacement():
 
     # it is pulling all elements as a tuple, and actually useless
     # _assert_manipulated_err1(streamtools.combinations_with_replacement(_err1, 2), (1, 1))
+
+
+@pytest.mark.parametrize('r', range(8))
+def test_combinatorics_match_itertools(r):
+    pool = Stream(*"ABCDEF")
+    for func in (streamtools.permutations, streamtools.combinations, streamtools.combinations_with_replacement):
+        assert list(func(pool, r) or ()) == list(getattr(itertools, func.__name__)("ABCDEF", r))
+
+
+@pytest.mark.parametrize('source', [streamtools.count, lambda: Stream.from_iterable(itertools.count(), chunk_size=4)])
+def test_deeply_nested(source):
+    depth = 5 * sys.getrecursionlimit()
+    s = source()
+    for _ in range(depth):
+        s = streamtools.sfilter(lambda x: x % 2 == 0, s)
+        s = streamtools.smap(lambda x: x + 2, s)
+        s = streamtools.filterfalse(lambda x: x < 0, s)
+        s = streamtools.takewhile(lambda x: True, s)
+        s = streamtools.compress(s, streamtools.repeat(1))
+    assert s[2] == 2 * depth + 4
+    s = source()
+    for _ in range(depth):
+        s = streamtools.sslice(streamtools.chain(s), 0, None)
+    assert s[2] == 2
+
+
+def test_pipeline():
+    s = Stream(*range(10))
+    pipeline = streamtools.Pipeline(s).smap(lambda x: x * 3).sfilter(lambda x: x % 2 == 0)
+    assert pipeline.stream() == Stream(0, 6, 12, 18, 24)
+    assert pipeline.sslice(1, None, 2).stream() == Stream(6, 18)
+    assert pipeline.takewhile(lambda x: x < 15).stream() == Stream(0, 6, 12)
+    assert pipeline.smap(lambda x: (x, 2)).starmap(pow).stream(chunk_size=2) == Stream(0, 36, 144, 324, 576)
+    assert pipeline.accumulate().stream() == Stream(0, 6, 18, 36, 60)
+    assert pipeline.source is s
+    assert [name for name, _ in pipeline.accumulate(max).stages] == ['smap', 'sfilter', 'accumulate']
+    assert pipeline.accumulate(max).stages[-1][1] == (max,)
+    assert list(pipeline.apply(range(4))) == [0, 6]
+    assert streamtools.Pipeline(None).smap(lambda x: x).stream() is None
+    assert streamtools.Pipeline(streamtools.count()).sfilter(lambda x: x % 7 == 0).stream()[3] == 21
+    _assert_manipulated_err1(streamtools.Pipeline(_err1).smap(lambda x: x).stream())